@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""End-to-end throughput of run_test + MultiModelManager against a local fake LLM
+
+Starts benchmarks/fake_llm_server.py, points the OpenAI and Anthropic
+clients at it and pushes the matched-pair prompts through the real
+pipeline (scheduler -> manager -> SDK -> HTTP -> scoring) at increasing
+concurrency. Reports prompts/sec, the scaling curve and tail latency.
+No API keys are used and nothing is billed.
+
+    python3 benchmarks/bench_pipeline.py --concurrency 1 4 16 --error-rate 0.02
+"""
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import argparse
+import json
+import time
+from datetime import datetime
+
+from src.core.geometric_tests import GeometricPrompt
+from src.tests.spiral_temporal import SpiralTemporalTest
+from src.tests.control_linear import LinearTemporalTest
+from src.engine.scheduler import MultiModelScheduler, ProviderLimits
+from fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+
+def point_clients_at(server: FakeLLMServer):
+    """Route both SDKs to the fake server with dummy credentials"""
+    os.environ["OPENAI_API_KEY"] = "fake-key"
+    os.environ["ANTHROPIC_API_KEY"] = "fake-key"
+    os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+    os.environ["ANTHROPIC_BASE_URL"] = server.anthropic_base_url
+    os.environ.pop("GOOGLE_API_KEY", None)
+
+
+def run_level(concurrency, models, prompts, samples):
+    """One pass of the whole pipeline at a given per-provider concurrency"""
+    from src.models.multi_model_manager import MultiModelManager
+
+    manager = MultiModelManager()
+    scheduler = MultiModelScheduler(
+        {m: manager.models.get(m) for m in models},
+        limits={'openai': ProviderLimits(concurrency), 'anthropic': ProviderLimits(concurrency)}
+    )
+    jobs = scheduler.build_jobs(models, prompts, samples)
+
+    start = time.perf_counter()
+    scheduler.run(jobs)
+    tests = {'linear': LinearTemporalTest, 'spiral': SpiralTemporalTest}
+    for model in models:
+        responses = scheduler.successful_responses(jobs, model, list(prompts), paired=False)
+        for condition, (condition_prompts, condition_responses) in responses.items():
+            tests[condition](model_name=model).run_responses(condition_prompts, condition_responses)
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for j in jobs if j.error)
+    latencies = sorted(j.latency for j in jobs if j.latency is not None)
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))] if latencies else None
+
+    return {
+        'concurrency': concurrency,
+        'jobs': len(jobs),
+        'seconds': elapsed,
+        'prompts_per_sec': len(jobs) / elapsed,
+        'errors': errors,
+        'latency_p50': pct(50),
+        'latency_p95': pct(95),
+        'latency_p99': pct(99),
+        'per_model': manager.instrumentation.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--models", nargs="+", default=["gpt-3.5", "haiku"])
+    parser.add_argument("--samples", type=int, default=1)
+    parser.add_argument("--prompts", default=os.path.join(ROOT, "data/prompts/matched_20_pairs.json"))
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--median-latency", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=0.0, help="server-side rate limit (429s)")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    with open(args.prompts) as f:
+        prompts_data = json.load(f)
+    prompts = {
+        'linear': [GeometricPrompt(**p) for p in prompts_data["linear"]],
+        'spiral': [GeometricPrompt(**p) for p in prompts_data["spiral"]],
+    }
+
+    config = FakeLLMConfig(args.latency, args.median_latency, args.latency_sigma,
+                           args.error_rate, args.rpm)
+
+    print("END-TO-END PIPELINE BENCHMARK (fake LLM server)")
+    print("=" * 60)
+    print(f"{'Conc':<6} {'Jobs':<6} {'Secs':<8} {'Prompts/s':<10} {'Speedup':<8} "
+          f"{'p50':<7} {'p95':<7} {'p99':<7} {'Errors':<6}")
+    print("-" * 60)
+
+    levels = []
+    with FakeLLMServer(config) as server:
+        point_clients_at(server)
+        for concurrency in args.concurrency:
+            r = run_level(concurrency, args.models, prompts, args.samples)
+            levels.append(r)
+            speedup = r['prompts_per_sec'] / levels[0]['prompts_per_sec']
+            print(f"{concurrency:<6} {r['jobs']:<6} {r['seconds']:<8.2f} {r['prompts_per_sec']:<10.1f} "
+                  f"{speedup:<8.2f} {r['latency_p50']:<7.3f} {r['latency_p95']:<7.3f} "
+                  f"{r['latency_p99']:<7.3f} {r['errors']:<6}")
+        server_stats = dict(server.stats)
+
+    print(f"\nServer: {server_stats}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'config': config.__dict__,
+                'models': args.models,
+                'levels': levels,
+                'server': server_stats,
+            }, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Benchmark the score_response hot path on synthetic corpora (fully offline)
+
+Measures responses/sec and peak memory for single, batch, parallel
+(src.core.parallel), registry (src.core.scoring_rules, the v1 spec that
+reproduces score_response) and registry_all (every registered scorer
+version in one pass) scoring across corpus sizes and response lengths.
+Results are compared against a stored baseline; a case slower than the
+baseline by more than --tolerance is reported as a regression (exit code 1).
+So is a registry case of at least --registry-min-batch responses that is
+slower than the faster of single and batch on the same corpus by more
+than --registry-tolerance.
+
+    python3 benchmarks/bench_scoring.py                  # compare to baseline
+    python3 benchmarks/bench_scoring.py --save-baseline  # record a new baseline
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import resource
+import time
+import tracemalloc
+from datetime import datetime
+from multiprocessing import cpu_count
+
+from src.core.geometric_tests import GeometricPrompt
+from src.tests.spiral_temporal import SpiralTemporalTest
+from src.tests.control_linear import LinearTemporalTest
+from src.core.parallel import ParallelScorer
+from src.core.scoring_rules import default_registry
+from corpus import make_responses
+
+TESTS = {'spiral': SpiralTemporalTest, 'linear': LinearTemporalTest}
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "scoring.json")
+
+PROMPT = GeometricPrompt(text="benchmark", category="benchmark", complexity=1,
+                         expected_pattern="none", prompt_id="benchmark")
+
+
+def score_single(test_name, responses, workers):
+    test = TESTS[test_name]()
+    return [test.score_response(PROMPT, r) for r in responses]
+
+
+def score_batch(test_name, responses, workers):
+    return TESTS[test_name]().score_responses([PROMPT] * len(responses), responses)
+
+
+def score_parallel(test_name, responses, workers):
+    return ParallelScorer(TESTS[test_name], workers=workers).score_matrix(responses)
+
+
+REGISTRY = default_registry()
+
+
+def score_registry(test_name, responses, workers):
+    return REGISTRY[f"{test_name}_v1"].score_batch(responses)
+
+
+def score_registry_all(test_name, responses, workers):
+    names = [name for name in REGISTRY.scorers if name.startswith(test_name)]
+    return REGISTRY.score_all(responses, names)[names[0]]
+
+
+PATHS = {'single': score_single, 'batch': score_batch, 'parallel': score_parallel,
+         'registry': score_registry, 'registry_all': score_registry_all}
+
+# The registry must keep up with the hand-coded scorer it replaces
+HAND_CODED = ('single', 'batch')
+
+
+def measure(path, test_name, responses, workers, repeat):
+    """Best-of-repeat throughput plus peak memory of one scoring path"""
+    func = PATHS[path]
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scores = func(test_name, responses, workers)
+        best = min(best, time.perf_counter() - start)
+    assert len(scores) == len(responses)
+
+    # Memory is measured on a separate run so tracing doesn't skew timings
+    tracemalloc.start()
+    func(test_name, responses, workers)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'responses_per_sec': len(responses) / best,
+        'seconds': best,
+        'peak_mb': peak / 2**20,
+        # Workers aren't traced; report their max RSS instead
+        'worker_maxrss_mb': (resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+                             if path == 'parallel' else None),
+    }
+
+
+def run_suite(sizes, lengths, paths, workers, repeat):
+    results = {}
+    for test_name in TESTS:
+        for n in sizes:
+            for length in lengths:
+                responses = make_responses(n, length, seed=n + length)
+                for path in paths:
+                    case = f"{test_name}/{path}/n={n}/len={length}"
+                    results[case] = measure(path, test_name, responses, workers, repeat)
+                    r = results[case]
+                    print(f"{case:<36} {r['responses_per_sec']:>12,.0f} resp/s "
+                          f"{r['peak_mb']:>8.2f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Cases whose throughput dropped more than `tolerance` below the baseline"""
+    regressions = []
+    for case, r in results.items():
+        if case not in baseline:
+            continue
+        expected = baseline[case]['responses_per_sec']
+        if r['responses_per_sec'] < expected * (1 - tolerance):
+            regressions.append((case, expected, r['responses_per_sec']))
+    return regressions
+
+
+def compare_registry(results, tolerance, min_batch):
+    """Registry cases of min_batch+ responses slower than the best hand-coded path on the same corpus"""
+    slower = []
+    for case, r in results.items():
+        test_name, path, size = case.split('/', 2)
+        n = int(size.split('/')[0].split('=')[1])
+        hand = [results[f"{test_name}/{p}/{size}"]['responses_per_sec'] for p in HAND_CODED
+                if f"{test_name}/{p}/{size}" in results]
+        if (path == 'registry' and n >= min_batch and hand
+                and r['responses_per_sec'] < max(hand) * (1 - tolerance)):
+            slower.append((case, max(hand), r['responses_per_sec']))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[20, 80, 300])
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--workers", type=int, default=cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed throughput drop vs baseline (fraction)")
+    parser.add_argument("--registry-tolerance", type=float, default=0.1,
+                        help="allowed registry throughput drop vs the hand-coded scorer (fraction)")
+    # Below a few hundred responses the registry's fixed per-batch setup (~0.2 ms) dominates
+    parser.add_argument("--registry-min-batch", type=int, default=1000,
+                        help="smallest batch the registry must keep up with the hand-coded scorer on")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    print("SCORING BENCHMARK")
+    print("=" * 60)
+    results = run_suite(args.sizes, args.lengths, args.paths, args.workers, args.repeat)
+    slower = compare_registry(results, args.registry_tolerance, args.registry_min_batch)
+    if slower:
+        print("\nREGISTRY SLOWER THAN HAND-CODED")
+        for case, expected, actual in slower:
+            print(f"  {case}: {actual:,.0f} resp/s (hand-coded {expected:,.0f})")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': cpu_count(), 'workers': args.workers},
+                'timestamp': datetime.now().isoformat(),
+                'results': results
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 1 if slower else 0
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline found; run with --save-baseline to record one")
+        return 1 if slower else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    print("\n" + "=" * 60)
+    if regressions:
+        print("REGRESSIONS")
+        for case, expected, actual in regressions:
+            print(f"  {case}: {actual:,.0f} resp/s (baseline {expected:,.0f})")
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} of baseline")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""Synthetic response corpora for offline benchmarks"""
+import random
+from typing import List
+
+# Words the scorers look for, mixed with filler so match rates look realistic
+MARKER_WORDS = [
+    'remember', 'remembering', 'think', 'thinking', 'realize', 'realized',
+    'understand', 'understanding', 'see', 'seeing', 'feel', 'feeling',
+    'different', 'deeper', 'evolved', 'layers', 'nuanced', 'growth',
+    'same', 'similar', 'but', 'yet', 'however', 'changed',
+    'before', 'previous', 'last', 'earlier', 'then', 'now', 'past', 'ago',
+    'next', 'after', 'following', 'finally', 'wednesday', 'calculus', 'three',
+]
+
+FILLER_WORDS = [
+    'the', 'a', 'of', 'and', 'to', 'in', 'it', 'is', 'was', 'that', 'my',
+    'morning', 'light', 'house', 'season', 'leaves', 'street', 'window',
+    'quiet', 'moment', 'time', 'way', 'story', 'again', 'slowly', 'around',
+]
+
+
+def make_responses(n: int, length: int, marker_rate: float = 0.15, seed: int = 0) -> List[str]:
+    """n responses of `length` words each, with ~marker_rate scorer markers"""
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(n):
+        words = [
+            rng.choice(MARKER_WORDS) if rng.random() < marker_rate else rng.choice(FILLER_WORDS)
+            for _ in range(length)
+        ]
+        words[0] = words[0].capitalize()
+        responses.append(' '.join(words) + '.')
+    return responses
@@ -0,0 +1,286 @@
+"""Local HTTP server speaking the OpenAI and Anthropic wire formats
+
+Used to benchmark the orchestration pipeline without spending money.
+Latency, error rate and rate limiting are configurable so the client side
+(retries, scheduler, instrumentation) sees realistic behaviour.
+
+    with FakeLLMServer(FakeLLMConfig(median_latency=0.4)) as server:
+        os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+        os.environ["ANTHROPIC_BASE_URL"] = server.anthropic_base_url
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+from corpus import make_responses
+
+
+@dataclass
+class FakeLLMConfig:
+    """Behaviour of the fake server"""
+    latency: str = "lognormal"  # fixed, uniform or lognormal
+    median_latency: float = 0.5  # seconds until the full response is ready
+    latency_sigma: float = 0.5  # lognormal shape / uniform half-width fraction
+    error_rate: float = 0.0  # fraction of requests answered with a 500
+    requests_per_minute: float = 0.0  # 0 disables rate limiting (429s)
+    response_words: int = 60
+    seed: int = 0
+
+
+class _TokenBucket:
+    def __init__(self, requests_per_minute: float):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """0 if allowed, otherwise seconds until a token is available"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class FakeLLMServer:
+    """Threaded fake provider; start()/stop() or use as a context manager"""
+
+    def __init__(self, config: FakeLLMConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeLLMConfig()
+        self.rng = random.Random(self.config.seed)
+        self.rng_lock = threading.Lock()
+        self.responses = make_responses(256, self.config.response_words, seed=self.config.seed)
+        self.bucket = _TokenBucket(self.config.requests_per_minute) if self.config.requests_per_minute else None
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0}
+        self.stats_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def anthropic_base_url(self) -> str:
+        return self.base_url
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def sample_latency(self) -> float:
+        c = self.config
+        with self.rng_lock:
+            if c.latency == "fixed":
+                return c.median_latency
+            if c.latency == "uniform":
+                width = c.median_latency * c.latency_sigma
+                return max(0.0, self.rng.uniform(c.median_latency - width, c.median_latency + width))
+            return self.rng.lognormvariate(0, c.latency_sigma) * c.median_latency
+
+    def sample_failure(self) -> bool:
+        with self.rng_lock:
+            return self.rng.random() < self.config.error_rate
+
+    def sample_text(self) -> str:
+        with self.rng_lock:
+            return self.rng.choice(self.responses)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: Dict, headers: Dict = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _sse(self, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for name, payload, delay in events:
+                        if delay:
+                            time.sleep(delay)
+                        line = f"event: {name}\n" if name else ""
+                        body = payload if isinstance(payload, str) else json.dumps(payload)
+                        self.wfile.write(f"{line}data: {body}\n\n".encode())
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client cancelled the stream (early stop)
+                self.close_connection = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server._count('requests')
+
+                anthropic_format = self.path.rstrip("/").endswith("/messages")
+                if not anthropic_format and not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+                if server.bucket:
+                    wait = server.bucket.take()
+                    if wait:
+                        server._count('rate_limited')
+                        return self._error(429, "rate_limit_error", "Rate limit exceeded",
+                                           anthropic_format, {"retry-after": f"{wait:.3f}"})
+
+                latency = server.sample_latency()
+                if server.sample_failure():
+                    time.sleep(latency / 2)
+                    server._count('errors')
+                    return self._error(500, "api_error", "Internal server error", anthropic_format)
+
+                prompt_tokens = sum(len(m.get("content", "").split()) for m in request.get("messages", []))
+                words = server.sample_text().split(" ")[:request.get("max_tokens", 150)]
+                model = request.get("model", "fake")
+                server._count('ok')
+
+                if request.get("stream"):
+                    per_token = latency / max(1, len(words))
+                    if anthropic_format:
+                        return self._sse(self._anthropic_events(model, words, prompt_tokens, per_token))
+                    include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+                    return self._sse(self._openai_events(model, words, per_token,
+                                                         prompt_tokens if include_usage else None))
+
+                time.sleep(latency)
+                text = " ".join(words)
+                if anthropic_format:
+                    return self._json(200, {
+                        "id": f"msg_{uuid.uuid4().hex[:24]}",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": model,
+                        "content": [{"type": "text", "text": text}],
+                        "stop_reason": "end_turn",
+                        "stop_sequence": None,
+                        "usage": {"input_tokens": prompt_tokens, "output_tokens": len(words)},
+                    })
+                return self._json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                              "total_tokens": prompt_tokens + len(words)},
+                })
+
+            def _error(self, status, kind, message, anthropic_format, headers=None):
+                if anthropic_format:
+                    body = {"type": "error", "error": {"type": kind, "message": message}}
+                else:
+                    body = {"error": {"type": kind, "message": message, "code": status}}
+                return self._json(status, body, headers)
+
+            @staticmethod
+            def _openai_events(model, words, per_token, prompt_tokens=None):
+                chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+                def chunk(delta, finish=None):
+                    return {"id": chunk_id, "object": "chat.completion.chunk",
+                            "created": int(time.time()), "model": model,
+                            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+
+                yield None, chunk({"role": "assistant", "content": ""}), 0
+                for i, word in enumerate(words):
+                    yield None, chunk({"content": word if i == 0 else " " + word}), per_token
+                yield None, chunk({}, "stop"), 0
+                if prompt_tokens is not None:
+                    # stream_options.include_usage: a final chunk with usage and no choices
+                    yield None, {"id": chunk_id, "object": "chat.completion.chunk",
+                                 "created": int(time.time()), "model": model, "choices": [],
+                                 "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                                           "total_tokens": prompt_tokens + len(words)}}, 0
+                yield None, "[DONE]", 0
+
+            @staticmethod
+            def _anthropic_events(model, words, prompt_tokens, per_token):
+                yield "message_start", {"type": "message_start", "message": {
+                    "id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "role": "assistant",
+                    "model": model, "content": [], "stop_reason": None, "stop_sequence": None,
+                    "usage": {"input_tokens": prompt_tokens, "output_tokens": 0}}}, 0
+                yield "content_block_start", {"type": "content_block_start", "index": 0,
+                                              "content_block": {"type": "text", "text": ""}}, 0
+                for i, word in enumerate(words):
+                    yield "content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {
+                        "type": "text_delta", "text": word if i == 0 else " " + word}}, per_token
+                yield "content_block_stop", {"type": "content_block_stop", "index": 0}, 0
+                yield "message_delta", {"type": "message_delta",
+                                        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                        "usage": {"output_tokens": len(words)}}, 0
+                yield "message_stop", {"type": "message_stop"}, 0
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI/Anthropic server")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--median-latency", type=float, default=0.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(args.latency, args.median_latency, args.latency_sigma,
+                           args.error_rate, args.rpm)
+    server = FakeLLMServer(config, port=args.port)
+    print(f"Fake LLM server on {server.base_url} (OpenAI: {server.openai_base_url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -4,6 +4,7 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.analysis.features import confound_report, extract_features
 from src.tests.spiral_temporal import SpiralTemporalTest
 from src.tests.control_linear import LinearTemporalTest
 
@@ -13,24 +14,16 @@ spiral_test = SpiralTemporalTest()
 linear_prompts = linear_test.generate_prompts(5)
 spiral_prompts = spiral_test.generate_prompts(7)
 
+linear_features = extract_features([p.text for p in linear_prompts], workers=1)
+spiral_features = extract_features([p.text for p in spiral_prompts], workers=1)
+
 print("COMPLEXITY ANALYSIS")
 print("="*40)
-
-# Word count
-linear_words = [len(p.text.split()) for p in linear_prompts]
-spiral_words = [len(p.text.split()) for p in spiral_prompts]
-
-print(f"\nWord count:")
-print(f"Linear: M={sum(linear_words)/len(linear_words):.1f} words")
-print(f"Spiral: M={sum(spiral_words)/len(spiral_words):.1f} words")
-
-# Sentence complexity (commas, subclauses)
-linear_commas = [p.text.count(',') for p in linear_prompts]
-spiral_commas = [p.text.count(',') for p in spiral_prompts]
-
-print(f"\nSubclauses (commas):")
-print(f"Linear: M={sum(linear_commas)/len(linear_commas):.1f}")
-print(f"Spiral: M={sum(spiral_commas)/len(spiral_commas):.1f}")
+print(f"\n{'feature':<22}{'linear':>9}{'spiral':>9}{'smd':>7}{'p':>8}")
+for name, row in confound_report(linear_features, spiral_features).items():
+    flag = "  <- confound?" if row['p_value'] < 0.05 else ""
+    print(f"{name:<22}{row['mean_a']:>9.2f}{row['mean_b']:>9.2f}"
+          f"{row['smd']:>7.2f}{row['p_value']:>8.3f}{flag}")
 
 # Print examples
 print("\n" + "="*40)
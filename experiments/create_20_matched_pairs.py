@@ -1,14 +1,27 @@
 #!/usr/bin/env python3
-"""Create 20 carefully matched prompt pairs"""
+"""Create 20 carefully matched prompt pairs
+
+Pairs are matched on token length under each target model's tokenizer.
+Word counts stand in only for tokenizers that are unavailable ('approx').
+A pair is kept only if its members are matched under every tokenizer.
+"""
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.core.geometric_tests import GeometricPrompt
+from src.models.token_counts import TokenLengthIndex
 import json
+import numpy as np
+
+# Models the pairs are run on; token lengths are checked per tokenizer
+TARGET_MODELS = ["gpt-3.5", "haiku", "gemini"]
+OUTPUT = "data/prompts/matched_20_pairs.json"
+# Largest accepted length gap, as a fraction of the longer member
+LENGTH_TOLERANCE = 0.1
 
 def create_20_matched_pairs():
-    """Create 20 pairs with exact word count matching"""
+    """Create the pairs whose token lengths match for every target model"""
     
     pairs = [
         # 8-word pairs
@@ -86,15 +99,34 @@ def create_20_matched_pairs():
     linear_prompts = []
     spiral_prompts = []
     
-    for i, pair in enumerate(pairs):
-        lin_words = len(pair["linear"].split())
-        spi_words = len(pair["spiral"].split())
-        
-        # Verify exact match
-        if lin_words != spi_words:
-            print(f"WARNING: Pair {i+1} mismatch: Linear={lin_words}, Spiral={spi_words}")
+    # Models see tokens, not words: match on each distinct tokenizer's lengths
+    index = TokenLengthIndex.for_prompts(OUTPUT)
+    lengths = {}
+    for model in TARGET_MODELS:
+        tokenizer = index.pool.resolve(model)[0]
+        if tokenizer in lengths:
+            continue
+        if tokenizer == 'approx':
+            # No real tokenizer: the word count is the better length measure
+            lengths[tokenizer] = ('words', np.array([len(p["linear"].split()) for p in pairs]),
+                                  np.array([len(p["spiral"].split()) for p in pairs]))
         else:
-            print(f"Pair {i+1}: {lin_words} words each ✓")
+            lengths[tokenizer] = ('tokens', index.lengths(model, [p["linear"] for p in pairs]),
+                                  index.lengths(model, [p["spiral"] for p in pairs]))
+    
+    for i, pair in enumerate(pairs):
+        gaps = []
+        for tokenizer, (unit, lin_lengths, spi_lengths) in lengths.items():
+            lin, spi = lin_lengths[i], spi_lengths[i]
+            if abs(lin - spi) > LENGTH_TOLERANCE * max(lin, spi):
+                gaps.append(f"{tokenizer} {unit}: Linear={lin}, Spiral={spi}")
+        
+        if gaps:
+            print(f"WARNING: Pair {i+1} dropped, length mismatch: " + "; ".join(gaps))
+            continue
+        print(f"Pair {i+1}: " + ", ".join(f"{tokenizer} {lin_lengths[i]}/{spi_lengths[i]} {unit}"
+                                          for tokenizer, (unit, lin_lengths, spi_lengths) in lengths.items())
+              + " ✓")
         
         linear_prompts.append(GeometricPrompt(
             text=pair["linear"],
@@ -110,17 +142,19 @@ def create_20_matched_pairs():
             expected_pattern="recursive"
         ))
     
-    return linear_prompts, spiral_prompts
+    return linear_prompts, spiral_prompts, index
 
-linear, spiral = create_20_matched_pairs()
+linear, spiral, index = create_20_matched_pairs()
 
 # Save
-with open("data/prompts/matched_20_pairs.json", "w") as f:
+with open(OUTPUT, "w") as f:
     json.dump({
         "linear": [p.__dict__ for p in linear],
         "spiral": [p.__dict__ for p in spiral],
         "n_pairs": len(linear)
     }, f, indent=2)
 
+index.save()
+
 print(f"\n✓ Created {len(linear)} matched pairs")
-print("Saved to data/prompts/matched_20_pairs.json")
+print(f"Saved to {OUTPUT} (token lengths: {index.path})")
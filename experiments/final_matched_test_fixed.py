@@ -9,13 +9,15 @@ load_dotenv()
 
 import json
 import numpy as np
-from scipy import stats
 from datetime import datetime
+from concurrent.futures import wait
 from src.core.geometric_tests import GeometricPrompt
+from src.core.paired_test import PairedTest
 from src.tests.spiral_temporal import SpiralTemporalTest
 from src.tests.control_linear import LinearTemporalTest
 from src.models.multi_model_manager import MultiModelManager
-from openai import OpenAI
+from src.engine.budget import BudgetScheduler, SpendBudget
+from src.analysis.mixed_effects import fit_mixed_effects, observations_from_pairs
 
 # Load matched prompts
 with open("data/prompts/matched_20_pairs.json", "r") as f:
@@ -29,53 +31,47 @@ print("FINAL TEST: 20 LENGTH-MATCHED PAIRS")
 print("="*60)
 print(f"Testing {len(linear_prompts)} exactly matched prompt pairs\n")
 
-manager = MultiModelManager()
-client = OpenAI()
+# USD caps from live token usage; pairs that don't fit are skipped whole
+BUDGET = {"gpt-4": 2.00}
+TOTAL_BUDGET = 5.00
 
-def test_gpt4(prompt_text):
-    """GPT-4 generation"""
-    response = client.chat.completions.create(
-        model="gpt-4-turbo-preview",
-        messages=[{"role": "user", "content": prompt_text}],
-        max_tokens=150,
-        temperature=0.7
-    )
-    return response.choices[0].message.content
+manager = MultiModelManager(models=["gpt-3.5", "haiku", "gpt-4"])
 
 all_results = {}
+paired_tests = {}
 
 # Test each model
 models_to_test = [
-    ("gpt-3.5", lambda p: manager.generate("gpt-3.5", p)),
-    ("haiku", lambda p: manager.generate("haiku", p)),
-    ("gpt-4", test_gpt4)
+    ("gpt-3.5", manager.models["gpt-3.5"]),
+    ("haiku", manager.models["haiku"]),
+    ("gpt-4", manager.models["gpt-4"])
 ]
 
+# Generate every model x condition x prompt up front, interleaving providers.
+# Linear/spiral pairs are dispatched together under the budget; the cheap
+# models go first so gpt-4 only takes the openai quota they leave idle.
+scheduler = BudgetScheduler(dict(models_to_test), SpendBudget(manager.instrumentation, BUDGET, TOTAL_BUDGET))
+conditions = {"linear": linear_prompts, "spiral": spiral_prompts}
+jobs = scheduler.build_jobs([name for name, _ in models_to_test], conditions)
+wait(scheduler.submit([j for j in jobs if j.model != "gpt-4"], priority=1)
+     + scheduler.submit([j for j in jobs if j.model == "gpt-4"], priority=0))
+
 for model_name, model_func in models_to_test:
     print(f"\nTesting {model_name.upper()}...")
     print("-"*40)
     
-    # Linear test
-    linear_test = LinearTemporalTest(model_name=model_name)
-    linear_results = linear_test.run_test(linear_prompts, model_func=model_func)
-    
-    # Spiral test
-    spiral_test = SpiralTemporalTest(model_name=model_name)
-    spiral_results = spiral_test.run_test(spiral_prompts, model_func=model_func)
-    
-    # Extract scores
-    linear_scores = [r['scores']['total'] for r in linear_test.results]
-    spiral_scores = [r['scores']['total'] for r in spiral_test.results]
-    
-    # Statistics - FIXED: using ttest_rel for paired samples
-    t_stat, p_value = stats.ttest_rel(linear_scores, spiral_scores)  # FIXED!
-    pooled_std = np.sqrt((np.var(linear_scores) + np.var(spiral_scores)) / 2)
-    cohens_d = (np.mean(linear_scores) - np.mean(spiral_scores)) / pooled_std if pooled_std > 0 else 0
+    # Pairs are recorded by pair_id; a pair with a failed member is not scored
+    paired = PairedTest(LinearTemporalTest(model_name=model_name),
+                        SpiralTemporalTest(model_name=model_name))
+    paired.record_jobs(jobs)
+    paired_tests[model_name] = paired
+    summary = paired.summary()
+    t_stat, p_value, cohens_d = summary['t_statistic'], summary['p_value'], summary['cohens_d']
     
     # Power calculation
     from scipy.stats import norm
     if cohens_d != 0:
-        n = len(linear_scores)
+        n = summary['n_pairs']
         z = cohens_d * np.sqrt(n)
         power = norm.cdf(z - 1.96)
     else:
@@ -83,12 +79,13 @@ for model_name, model_func in models_to_test:
     
     # Results
     results = {
-        'n_pairs': len(linear_scores),
-        'linear_mean': np.mean(linear_scores),
-        'linear_sd': np.std(linear_scores),
-        'spiral_mean': np.mean(spiral_scores),
-        'spiral_sd': np.std(spiral_scores),
-        'difference': np.mean(linear_scores) - np.mean(spiral_scores),
+        'n_pairs': summary['n_pairs'],
+        'n_failed_pairs': summary['n_failed'],
+        'linear_mean': summary['linear_mean'],
+        'linear_sd': summary['linear_sd'],
+        'spiral_mean': summary['spiral_mean'],
+        'spiral_sd': summary['spiral_sd'],
+        'difference': summary['difference'],
         't_statistic': t_stat,
         'p_value': p_value,
         'cohens_d': cohens_d,
@@ -100,7 +97,7 @@ for model_name, model_func in models_to_test:
     print(f"Linear: M={results['linear_mean']:.3f} (SD={results['linear_sd']:.3f})")
     print(f"Spiral: M={results['spiral_mean']:.3f} (SD={results['spiral_sd']:.3f})")
     print(f"Difference: {results['difference']:.3f}")
-    print(f"t({len(linear_scores)-1})={t_stat:.3f}, p={p_value:.4f}")
+    print(f"t({summary['n_pairs']-1})={t_stat:.3f}, p={p_value:.4f}")
     print(f"Cohen's d={cohens_d:.3f}, Power={power:.1%}")
     
     if p_value < 0.05:
@@ -120,6 +117,22 @@ for model, r in all_results.items():
     print(f"{model:<10} {r['n_pairs']:<5} {r['linear_mean']:<8.3f} {r['spiral_mean']:<8.3f} "
           f"{r['difference']:<8.3f} {r['cohens_d']:<8.3f} {r['p_value']:<8.4f} {sig:<5}")
 
+# The same pairs are reused across models, so also fit them jointly on the
+# pairs every model completed, aligned by pair_id
+common = [p['pair_id'] for p in paired_tests[models_to_test[0][0]].pairs
+          if all(p['pair_id'] in {q['pair_id'] for q in t.pairs} for t in paired_tests.values())]
+mixed = None
+if common:
+    scores_by_model = {model: t.scores(common) for model, t in paired_tests.items()}
+    mixed = fit_mixed_effects(observations_from_pairs(scores_by_model))
+    print("\nCrossed random effects (pair, prompt, pair:model), spiral - linear:")
+    for model, e in mixed['effects'].items():
+        p_text = "n/a" if e['p_value'] is None else f"{e['p_value']:.4f}"
+        print(f"{model:<10} {e['effect']:<8.3f} SE={e['se']:.3f} "
+              f"95% CI [{e['ci'][0]:.3f}, {e['ci'][1]:.3f}] p={p_text}")
+else:
+    print("\nNo pair completed by every model; skipping the mixed-effects fit")
+
 # Save everything
 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 filename = f"data/results/final_matched_{timestamp}.json"
@@ -128,6 +141,16 @@ with open(filename, "w") as f:
 
 print(f"\nResults saved to {filename}")
 
+if mixed is not None:
+    mixed_filename = f"data/results/final_matched_{timestamp}_mixed.json"
+    with open(mixed_filename, "w") as f:
+        json.dump(mixed, f, indent=2)
+    print(f"Mixed-effects fit saved to {mixed_filename}")
+
+calls_filename = f"data/results/final_matched_{timestamp}_calls.json"
+manager.instrumentation.export(calls_filename)
+print(f"Call metrics saved to {calls_filename}")
+
 # Final verdict
 significant_models = [m for m, r in all_results.items() if r['p_value'] < 0.05]
 print("\n" + "="*60)
@@ -140,9 +163,11 @@ else:
     print("Length confound may explain much of the effect")
 print("="*60)
 
-# Cost estimate
-cost_gpt35 = 20 * 2 * 0.002  # 20 pairs, 2 conditions
-cost_haiku = 20 * 2 * 0.001
-cost_gpt4 = 20 * 2 * 0.03  # Much more expensive
-total_cost = cost_gpt35 + cost_haiku + cost_gpt4
-print(f"\nEstimated cost: ${total_cost:.2f}")
+# Cost and latency from recorded token usage
+print(f"\n{'Model':<10} {'Calls':<6} {'p50 s':<8} {'p95 s':<8} {'Tokens':<8} {'Cost':<8}")
+for model, m in manager.instrumentation.summary().items():
+    p50 = m['latency']['p50'] or 0
+    p95 = m['latency']['p95'] or 0
+    tokens = m['prompt_tokens'] + m['completion_tokens']
+    print(f"{model:<10} {m['n_calls']:<6} {p50:<8.2f} {p95:<8.2f} {tokens:<8} ${m['cost']:<7.4f}")
+print(f"\nTotal cost: ${manager.instrumentation.total_cost():.4f}")
@@ -15,6 +15,8 @@ from src.core.geometric_tests import GeometricPrompt
 from src.tests.spiral_temporal import SpiralTemporalTest
 from src.tests.control_linear import LinearTemporalTest
 from src.models.multi_model_manager import MultiModelManager
+from src.engine.scheduler import MultiModelScheduler
+from src.engine.metrics import RunMetrics, MetricsServer, ProgressBars
 
 def run_full_power():
     """Run with all 20 unique prompts"""
@@ -30,33 +32,45 @@ def run_full_power():
     manager = MultiModelManager()
     all_results = {}
     
+    models = []
     for model_name in ['gpt-3.5', 'haiku', 'gemini']:
         if model_name not in manager.models:
             print(f"Skipping {model_name} - not configured")
-            continue
-            
+        else:
+            models.append(model_name)
+    
+    linear_prompts = [GeometricPrompt(**p) for p in prompts_data["linear"]]
+    spiral_prompts = [GeometricPrompt(**p) for p in prompts_data["spiral"]]
+    
+    # Generate everything up front with live progress and a /metrics endpoint
+    metrics = RunMetrics(instrumentation=[manager.instrumentation])
+    server = MetricsServer(metrics, port=int(os.getenv("METRICS_PORT", 9108))).start()
+    print(f"Live metrics at {server.url}")
+    
+    scheduler = MultiModelScheduler({m: manager.models[m] for m in models}, metrics=metrics)
+    jobs = scheduler.build_jobs(models, {"linear": linear_prompts, "spiral": spiral_prompts})
+    metrics.expect(jobs)
+    progress = ProgressBars(metrics)
+    try:
+        scheduler.run(jobs)
+    finally:
+        progress.close()
+        server.stop()
+    
+    for model_name in models:
         print(f"\n\nTesting {model_name.upper()} with 20 unique prompts each")
         print("-"*40)
         
+        # Failed calls are left out rather than scored
+        responses = scheduler.successful_responses(jobs, model_name, ["linear", "spiral"], paired=False)
+        
         # Linear test with proper scoring
         linear_test = LinearTemporalTest(model_name=model_name)
-        linear_prompts = [GeometricPrompt(**p) for p in prompts_data["linear"]]
-        
-        print("Running linear prompts...")
-        linear_results = linear_test.run_test(
-            linear_prompts,
-            model_func=lambda p: manager.generate(model_name, p)
-        )
+        linear_results = linear_test.run_responses(*responses["linear"])
         
         # Spiral test with proper scoring  
         spiral_test = SpiralTemporalTest(model_name=model_name)
-        spiral_prompts = [GeometricPrompt(**p) for p in prompts_data["spiral"]]
-        
-        print("Running spiral prompts...")
-        spiral_results = spiral_test.run_test(
-            spiral_prompts,
-            model_func=lambda p: manager.generate(model_name, p)
-        )
+        spiral_results = spiral_test.run_responses(*responses["spiral"])
         
         # Extract scores
         linear_scores = [r['scores']['total'] for r in linear_test.results]
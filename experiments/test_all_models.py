@@ -10,33 +10,30 @@ load_dotenv()
 from src.tests.spiral_temporal import SpiralTemporalTest
 from src.tests.control_linear import LinearTemporalTest
 from src.models.multi_model_manager import MultiModelManager
+from src.engine.scheduler import MultiModelScheduler
 import json
 import numpy as np
 from scipy import stats
 from datetime import datetime
 
-def test_model(model_name, manager, n_prompts=10):
-    """Test one model"""
+LINEAR_PROMPTS = LinearTemporalTest().generate_prompts(n=5)  # Use our 5 unique ones
+SPIRAL_PROMPTS = SpiralTemporalTest().generate_prompts(n=7)  # Use our 7 unique ones
+
+def test_model(model_name, scheduler, jobs):
+    """Score one model's scheduled responses"""
     print(f"\nTesting {model_name.upper()}...")
     print("-"*40)
     
+    # Failed calls are left out rather than scored
+    responses = scheduler.successful_responses(jobs, model_name, ["linear", "spiral"], paired=False)
+    
     # Linear test
     linear_test = LinearTemporalTest(model_name=model_name)
-    linear_prompts = linear_test.generate_prompts(n=5)  # Use our 5 unique ones
-    
-    linear_results = linear_test.run_test(
-        linear_prompts,
-        model_func=lambda p: manager.generate(model_name, p)
-    )
+    linear_results = linear_test.run_responses(*responses["linear"])
     
     # Spiral test
     spiral_test = SpiralTemporalTest(model_name=model_name)
-    spiral_prompts = spiral_test.generate_prompts(n=7)  # Use our 7 unique ones
-    
-    spiral_results = spiral_test.run_test(
-        spiral_prompts,
-        model_func=lambda p: manager.generate(model_name, p)
-    )
+    spiral_results = spiral_test.run_responses(*responses["spiral"])
     
     # Calculate stats
     linear_scores = [r['scores']['total'] for r in linear_test.results]
@@ -87,10 +84,16 @@ def main():
     
     all_results = {}
     
+    # Generate for all models at once, interleaving provider quotas
+    scheduler = MultiModelScheduler({model: manager.models[model] for model in available_models})
+    jobs = scheduler.run(scheduler.build_jobs(
+        available_models, {"linear": LINEAR_PROMPTS, "spiral": SPIRAL_PROMPTS}
+    ))
+    
     # Test each model
     for model in available_models:
         try:
-            results = test_model(model, manager)
+            results = test_model(model, scheduler, jobs)
             all_results[model] = results
         except Exception as e:
             print(f"Failed to test {model}: {e}")
@@ -120,8 +123,11 @@ def main():
     with open(f"data/results/multimodel_{timestamp}.json", "w") as f:
         json.dump(all_results, f, indent=2)
     
+    manager.instrumentation.export(f"data/results/multimodel_{timestamp}_calls.json")
+    
     print(f"\n\nTotal costs: {manager.costs}")
     print(f"Results saved to data/results/multimodel_{timestamp}.json")
+    print(f"Call metrics saved to data/results/multimodel_{timestamp}_calls.json")
     
     # Scientific conclusion
     consistent_effect = all([r['difference'] > 0 for r in all_results.values()])
@@ -7,28 +7,50 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from dotenv import load_dotenv
 load_dotenv()
 
+import argparse
+import json
+from datetime import datetime
 from src.models.multi_model_manager import MultiModelManager
-import numpy as np
+from src.engine.depth_sweep import DepthSweep
 
 def test_depth():
-    prompts_by_depth = {
-        1: "I remember last week when...",
-        2: "I remember last week remembering the previous week when...",
-        3: "I remember last week remembering the previous week thinking about the week before when...",
-        4: "I remember last week remembering the previous week thinking about the week before that, which reminded me of the week before that when...",
-    }
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-depth", type=int, default=20)
+    parser.add_argument("--templates", type=int, default=50, help="prompts per depth (depth 1 has at most 50)")
+    parser.add_argument("--models", nargs="+", default=['gpt-3.5', 'haiku', 'gemini'])
+    parser.add_argument("--bootstrap", type=int, default=1000)
+    args = parser.parse_args()
     
     manager = MultiModelManager()
+    models = [m for m in args.models if m in manager.models]
+    
+    sweep = DepthSweep({m: manager.models[m] for m in models},
+                       max_depth=args.max_depth, n_templates=args.templates)
+    n_prompts = sum(len(prompts) for prompts in sweep.prompts.values())
     
     print("RECURSION DEPTH DEGRADATION TEST")
     print("="*40)
+    print(f"Depths 1-{args.max_depth}, {n_prompts} prompts x {len(models)} models "
+          f"= {n_prompts * len(models)} calls")
+    
+    results = sweep.run(n_boot=args.bootstrap)
     
-    for model in ['gpt-3.5', 'haiku', 'gemini']:
+    for model, curve in results.items():
         print(f"\n{model.upper()}:")
-        for depth, prompt in prompts_by_depth.items():
-            response = manager.generate(model, prompt)
-            coherence = len(response.split()) / (50 * depth)  # Normalize by expected length
-            print(f"  Depth {depth}: Coherence={coherence:.3f}")
+        if 'error' in curve:
+            print(f"  {curve['error']}")
+            continue
+        for i, depth in enumerate(curve['depths']):
+            print(f"  Depth {depth:>2}: mean={curve['mean'][i]:.3f} "
+                  f"fit={curve['fit'][i]:.3f} [{curve['lower'][i]:.3f}, {curve['upper'][i]:.3f}]")
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs("data/results", exist_ok=True)
+    filename = f"data/results/depth_sweep_{timestamp}.json"
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {filename}")
+    print(f"Total cost: ${sum(manager.costs.values()):.2f}")
 
 if __name__ == "__main__":
     test_depth()
@@ -0,0 +1,60 @@
+"""Monotone degradation curves with bootstrap confidence bands"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def isotonic_decreasing(y: Sequence[float], w: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Weighted least-squares non-increasing fit (pool adjacent violators)"""
+    y = np.asarray(y, dtype=float)
+    w = np.ones_like(y) if w is None else np.asarray(w, dtype=float)
+
+    values, weights, sizes = [], [], []
+    for yi, wi in zip(y, w):
+        values.append(yi)
+        weights.append(wi)
+        sizes.append(1)
+        # A later block above an earlier one violates monotonicity: pool them
+        while len(values) > 1 and values[-2] < values[-1]:
+            total = weights[-2] + weights[-1]
+            values[-2] = (values[-2] * weights[-2] + values[-1] * weights[-1]) / total
+            weights[-2] = total
+            sizes[-2] += sizes[-1]
+            del values[-1], weights[-1], sizes[-1]
+
+    return np.repeat(values, sizes)
+
+
+def fit_degradation(scores_by_depth: Dict[int, List[float]], n_boot: int = 1000,
+                    ci: float = 0.95, seed: int = 0) -> Dict:
+    """Fit a non-increasing score-vs-depth curve with percentile bootstrap bands
+
+    Each bootstrap replicate resamples scores within every depth, recomputes
+    the depth means and refits the monotone curve.
+    """
+    depths = sorted(d for d, s in scores_by_depth.items() if len(s))
+    samples = [np.asarray(scores_by_depth[d], dtype=float) for d in depths]
+    counts = np.array([len(s) for s in samples], dtype=float)
+    means = np.array([s.mean() for s in samples])
+    fit = isotonic_decreasing(means, counts)
+
+    rng = np.random.default_rng(seed)
+    boot_means = np.column_stack([
+        s[rng.integers(0, len(s), size=(n_boot, len(s)))].mean(axis=1) for s in samples
+    ])
+    boot_fits = np.vstack([isotonic_decreasing(row, counts) for row in boot_means])
+    alpha = (1 - ci) / 2
+    lower, upper = np.quantile(boot_fits, [alpha, 1 - alpha], axis=0)
+
+    return {
+        'depths': depths,
+        'n': counts.astype(int).tolist(),
+        'mean': means.tolist(),
+        'sd': [float(s.std()) for s in samples],
+        'fit': fit.tolist(),
+        'lower': lower.tolist(),
+        'upper': upper.tolist(),
+        'ci': ci,
+        # Relative to depth 1, the quantity the README table reports
+        'relative_fit': (fit / fit[0]).tolist() if fit[0] > 0 else None,
+    }
@@ -0,0 +1,226 @@
+"""Complexity and confound features for prompts and responses at corpus scale
+
+Each text becomes a row of surface features that can explain a score
+difference apart from the geometry under test:
+
+    tokens               tokens under a model's tokenizer (src.models.token_counts, gpt-3.5 by default)
+    words, characters, sentences
+    clauses              clause boundaries (, ; : dashes) plus subordinators, plus one per sentence
+    clause_depth         deepest sentence: 1 + subordinators + bracket nesting
+    lexical_density      content words / words
+    type_token_ratio     distinct words / words
+    mean_word_length
+    flesch_reading_ease  with a vowel-group syllable estimate
+    <marker>_markers     occurrences of each marker word list (recursive, sequential, temporal)
+
+Per-text work is a few compiled-regex passes that produce integer counts.
+All ratios are then computed on whole columns with numpy. Large corpora are
+split into shards across a process pool, and token counting runs per shard
+in batches.
+"""
+import math
+import os
+import re
+import warnings
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import Pool
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy import stats
+
+from src.core.archive import ResponseArchive
+from src.models.token_counts import count_tokens as model_token_counts
+
+WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+TOKEN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = re.compile(r"[.!?…]+(?=\s|$)")
+CLAUSE_BREAK = re.compile(r"[,;:–—]|\s-\s")
+VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+SUBORDINATORS = frozenset({
+    'after', 'although', 'because', 'before', 'if', 'once', 'since', 'that', 'though',
+    'unless', 'until', 'when', 'whenever', 'where', 'whereas', 'whether', 'which', 'while', 'who',
+})
+
+FUNCTION_WORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'nor', 'so', 'yet', 'for', 'of', 'in', 'on', 'at', 'to',
+    'by', 'with', 'from', 'into', 'onto', 'about', 'as', 'than', 'then', 'i', 'you', 'he', 'she',
+    'it', 'we', 'they', 'me', 'him', 'her', 'us', 'them', 'my', 'your', 'his', 'its', 'our',
+    'their', 'this', 'that', 'these', 'those', 'is', 'am', 'are', 'was', 'were', 'be', 'been',
+    'being', 'do', 'does', 'did', 'have', 'has', 'had', 'will', 'would', 'shall', 'should', 'can',
+    'could', 'may', 'might', 'must', 'not', 'no', 'there', 'here', 'what', 'which', 'who', 'whom',
+    'if', 'when', 'while', 'because', 'since', 'until', 'after', 'before', 'all', 'each', 'some',
+}) | SUBORDINATORS
+
+# Marker vocabularies taken from the spiral and linear scorers
+DEFAULT_MARKERS = {
+    'recursive': ('remember', 'remembering', 'think', 'thinking', 'realize', 'realized',
+                  'understand', 'understanding', 'loops', 'circles', 'again', 'spiral', 'return'),
+    'sequential': ('then', 'next', 'after', 'following', 'subsequently', 'finally', 'first', 'second'),
+    'temporal': ('before', 'previous', 'last', 'earlier', 'now', 'past', 'ago', 'prior', 'formerly'),
+}
+
+# Tokenizer used for the tokens column unless a counter is given; matches the pair matcher's
+TOKENIZER_MODEL = 'gpt-3.5'
+
+COUNT_COLUMNS = ('tokens', 'words', 'characters', 'sentences', 'clauses', 'clause_depth',
+                 'content_words', 'distinct_words', 'letters', 'syllables')
+FEATURE_COLUMNS = ('tokens', 'words', 'characters', 'sentences', 'clauses', 'clause_depth',
+                   'lexical_density', 'type_token_ratio', 'mean_word_length', 'flesch_reading_ease')
+
+
+def regex_token_counts(texts: Sequence[str]) -> List[int]:
+    """Word/punctuation token counts; a tokenizer-free stand-in for BPE counts"""
+    return [len(TOKEN.findall(t)) for t in texts]
+
+
+def _clause_depth(sentence: str, words: List[str]) -> int:
+    nesting = depth = 0
+    for ch in sentence:
+        if ch in '([{':
+            nesting += 1
+            depth = max(depth, nesting)
+        elif ch in ')]}':
+            nesting = max(0, nesting - 1)
+    return 1 + depth + sum(1 for w in words if w in SUBORDINATORS)
+
+
+class FeatureExtractor:
+    """Turns a batch of texts into a (n x len(columns)) float array"""
+
+    def __init__(self, markers: Optional[Dict[str, Sequence[str]]] = None,
+                 count_tokens: Optional[Callable[[Sequence[str]], Sequence[int]]] = None,
+                 model: str = TOKENIZER_MODEL):
+        self.markers = {name: frozenset(words) for name, words in (markers or DEFAULT_MARKERS).items()}
+        # Batch token counter; must be picklable to run in worker processes
+        self.count_tokens = count_tokens or partial(model_token_counts, model)
+        self.columns = list(FEATURE_COLUMNS) + [f"{name}_markers" for name in self.markers]
+
+    def _counts(self, text: str) -> List[int]:
+        lower = text.lower()
+        words = WORD.findall(lower)
+        sentences = [s for s in SENTENCE_END.split(lower) if s.strip()] or [lower]
+        subordinators = sum(1 for w in words if w in SUBORDINATORS)
+        row = [
+            0,  # tokens, filled per batch
+            len(words),
+            len(text),
+            len(sentences),
+            len(CLAUSE_BREAK.findall(text)) + subordinators + len(sentences),
+            max(_clause_depth(s, WORD.findall(s)) for s in sentences),
+            sum(1 for w in words if w not in FUNCTION_WORDS),
+            len(set(words)),
+            sum(len(w) for w in words),
+            sum(max(1, len(VOWEL_GROUPS.findall(w))) for w in words),
+        ]
+        row.extend(sum(1 for w in words if w in vocabulary) for vocabulary in self.markers.values())
+        return row
+
+    def extract(self, texts: Sequence[str]) -> np.ndarray:
+        counts = np.array([self._counts(t) for t in texts], dtype=np.float64).reshape(
+            len(texts), len(COUNT_COLUMNS) + len(self.markers))
+        counts[:, 0] = self.count_tokens(list(texts))
+        c = dict(zip(COUNT_COLUMNS, counts.T))
+        words = np.maximum(c['words'], 1)
+        out = np.empty((len(texts), len(self.columns)), dtype=np.float64)
+        out[:, :6] = counts[:, :6]
+        out[:, 6] = c['content_words'] / words
+        out[:, 7] = c['distinct_words'] / words
+        out[:, 8] = c['letters'] / words
+        out[:, 9] = 206.835 - 1.015 * words / np.maximum(c['sentences'], 1) - 84.6 * c['syllables'] / words
+        out[:, 10:] = counts[:, len(COUNT_COLUMNS):]
+        return out
+
+
+@dataclass
+class FeatureMatrix:
+    """Feature rows in input order with named columns"""
+    columns: List[str]
+    values: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.columns.index(name)]
+
+    def covariates(self, names: Optional[Sequence[str]] = None, standardize: bool = True) -> Dict[str, np.ndarray]:
+        """Columns to merge into mixed-effects observations, z-scored by default"""
+        out = {}
+        for name in names or self.columns:
+            x = self.column(name)
+            sd = x.std()
+            out[name] = (x - x.mean()) / sd if standardize and sd > 0 else x - x.mean()
+        return out
+
+
+# Per-worker extractor (and archive), attached once in the pool initializer
+_worker = {}
+
+
+def _init_worker(extractor: FeatureExtractor, archive_path: Optional[str] = None):
+    _worker['extractor'] = extractor
+    _worker['archive'] = ResponseArchive(archive_path) if archive_path else None
+
+
+def _extract_shard(task) -> np.ndarray:
+    texts = task if _worker['archive'] is None else _worker['archive'].responses(task)
+    return _worker['extractor'].extract(texts)
+
+
+def _run_shards(extractor: FeatureExtractor, tasks: list, workers: int,
+                archive_path: Optional[str] = None) -> np.ndarray:
+    if workers <= 1:
+        _init_worker(extractor, archive_path)
+        shards = [_extract_shard(task) for task in tasks]
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(extractor, archive_path)) as pool:
+            shards = pool.map(_extract_shard, tasks, chunksize=1)
+    return np.vstack(shards) if shards else np.empty((0, len(extractor.columns)))
+
+
+def _shard_bounds(n: int, workers: int, shard_size: Optional[int]) -> List[range]:
+    size = shard_size or max(1, min(20000, math.ceil(n / (workers * 4))))
+    return [range(i, min(n, i + size)) for i in range(0, n, size)]
+
+
+def extract_features(texts: Sequence[str], workers: Optional[int] = None,
+                     shard_size: Optional[int] = None,
+                     extractor: Optional[FeatureExtractor] = None) -> FeatureMatrix:
+    """Features for every text, sharded across `workers` processes (1 = in-process)"""
+    extractor = extractor or FeatureExtractor()
+    workers = workers or os.cpu_count() or 1
+    tasks = [list(texts[r.start:r.stop]) for r in _shard_bounds(len(texts), workers, shard_size)]
+    return FeatureMatrix(list(extractor.columns), _run_shards(extractor, tasks, workers))
+
+
+def extract_archive_features(path: str, rows: Optional[Sequence[int]] = None,
+                             workers: Optional[int] = None, shard_size: Optional[int] = None,
+                             extractor: Optional[FeatureExtractor] = None) -> FeatureMatrix:
+    """Features for rows of a ResponseArchive, read by workers from the mapped files"""
+    extractor = extractor or FeatureExtractor()
+    workers = workers or os.cpu_count() or 1
+    rows = np.arange(len(ResponseArchive(path))) if rows is None else np.asarray(rows, dtype=np.int64)
+    tasks = [rows[r.start:r.stop] for r in _shard_bounds(len(rows), workers, shard_size)]
+    return FeatureMatrix(list(extractor.columns), _run_shards(extractor, tasks, workers, path))
+
+
+def confound_report(a: FeatureMatrix, b: FeatureMatrix) -> Dict[str, Dict[str, float]]:
+    """Per-feature means, standardized mean difference (b - a) and Welch p-value"""
+    with warnings.catch_warnings():
+        # Constant columns (e.g. a marker absent from both sets) have no test
+        warnings.simplefilter('ignore', RuntimeWarning)
+        _, p = stats.ttest_ind(a.values, b.values, axis=0, equal_var=False)
+    pooled = np.sqrt((a.values.var(axis=0, ddof=1) + b.values.var(axis=0, ddof=1)) / 2)
+    report = {}
+    for j, name in enumerate(a.columns):
+        diff = b.values[:, j].mean() - a.values[:, j].mean()
+        report[name] = {
+            'mean_a': float(a.values[:, j].mean()),
+            'mean_b': float(b.values[:, j].mean()),
+            'smd': float(diff / pooled[j]) if pooled[j] > 0 else 0.0,
+            'p_value': float(p[j]) if not np.isnan(p[j]) else 1.0,
+        }
+    return report
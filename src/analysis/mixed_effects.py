@@ -0,0 +1,160 @@
+"""Crossed random-effects models for scores across models and matched prompts
+
+The matched-pair experiments reuse the same prompts across models, so the
+per-model paired t-tests treat correlated scores as independent evidence.
+fit_mixed_effects fits
+
+    score = intercept[model] + effect[model] * (condition == treatment)
+            + u_pair + u_prompt + u_pair:model + beta . covariates + residual
+
+by REML, with each random term an independent Gaussian intercept. The
+random-effect design is a sparse indicator matrix. Each REML evaluation
+factors only the sparse random-effect block of the mixed-model equations
+with SuperLU. The handful of fixed effects are then solved through their
+small dense Schur complement, and only the variance ratios are optimized
+numerically.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+from scipy import optimize, sparse, stats
+from scipy.sparse.linalg import splu
+
+DEFAULT_RANDOM = ('pair', 'prompt', 'pair:model')
+
+
+def observations_from_pairs(scores: Dict[str, Dict[str, List[float]]],
+                            conditions=('linear', 'spiral')) -> Dict[str, list]:
+    """Long-format observations from {model: {condition: scores}} matched by index
+
+    This is the shape the matched-pair experiments produce: position i in
+    every condition list is pair i, and the same prompts are used for all models.
+    """
+    columns = {'score': [], 'model': [], 'condition': [], 'prompt': [], 'pair': []}
+    for model, by_condition in scores.items():
+        for condition in conditions:
+            for i, score in enumerate(by_condition[condition]):
+                columns['score'].append(score)
+                columns['model'].append(model)
+                columns['condition'].append(condition)
+                columns['prompt'].append(f"{condition}_{i}")
+                columns['pair'].append(str(i))
+    return columns
+
+
+def _codes(observations: Dict[str, Sequence], term: str) -> np.ndarray:
+    """Integer level codes for a grouping term, ':' meaning interaction"""
+    keys = [np.asarray(observations[c]).astype(str) for c in term.split(':')]
+    combined = keys[0]
+    for key in keys[1:]:
+        combined = np.char.add(np.char.add(combined, '\x1f'), key)
+    return np.unique(combined, return_inverse=True)[1]
+
+
+def fit_mixed_effects(observations: Dict[str, Sequence], random: Sequence[str] = DEFAULT_RANDOM,
+                      treatment: str = 'spiral', ci: float = 0.95,
+                      covariates: Sequence[str] = ()) -> Dict:
+    """REML fit of per-model condition effects with crossed random intercepts
+
+    `observations` holds equal-length columns 'score', 'model', 'condition'
+    and whatever columns the random terms name. Each name in `covariates` is
+    a numeric column (e.g. from analysis.features) entered as a shared,
+    centered fixed slope, so effects are adjusted for it. Uncertainty for the
+    fixed effects comes from the REML covariance with a normal reference.
+    """
+    y = np.asarray(observations['score'], dtype=float)
+    n = len(y)
+    model_col = np.asarray(observations['model']).astype(str)
+    treated = (np.asarray(observations['condition']).astype(str) == treatment).astype(float)
+    models = sorted(set(model_col.tolist()))
+
+    rows = np.arange(n)
+    model_codes = np.searchsorted(models, model_col)
+    k = 2 * len(models)
+    X = sparse.csr_matrix(
+        (np.concatenate([np.ones(n), treated]),
+         (np.concatenate([rows, rows]), np.concatenate([2 * model_codes, 2 * model_codes + 1]))),
+        shape=(n, k))
+    if covariates:
+        C = np.column_stack([np.asarray(observations[c], dtype=float) for c in covariates])
+        # Centered, so intercepts stay per-model means at the average covariate values
+        X = sparse.hstack([X, sparse.csr_matrix(C - C.mean(axis=0))], format='csr')
+    p = X.shape[1]
+
+    blocks, sizes = [], []
+    for term in random:
+        codes = _codes(observations, term)
+        sizes.append(int(codes.max()) + 1 if n else 0)
+        blocks.append(sparse.csr_matrix((np.ones(n), (rows, codes)), shape=(n, sizes[-1])))
+    Z = sparse.hstack(blocks, format='csr')
+
+    # Cross products are fixed; only the Z'Z diagonal shift changes per evaluation
+    XtX = (X.T @ X).toarray()
+    Xty = X.T @ y
+    ZtZ = (Z.T @ Z).tocsc()
+    # Z'X and Z'y share one multi-column solve against the random-effect block
+    Zt_Xy = np.column_stack([(Z.T @ X).toarray(), Z.T @ y])
+    yty = float(y @ y)
+    dof = n - p
+
+    def solve(log_ratios):
+        """Henderson's equations with the random block factored and the fixed block as its Schur complement"""
+        shift = sparse.diags(np.repeat(np.exp(-log_ratios), sizes))
+        lu = splu((ZtZ + shift).tocsc(), permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.0,
+                  options={'SymmetricMode': True})
+        W = lu.solve(Zt_Xy)
+        schur = XtX - Zt_Xy[:, :p].T @ W[:, :p]
+        beta = np.linalg.solve(schur, Xty - Zt_Xy[:, :p].T @ W[:, p])
+        u = W[:, p] - W[:, :p] @ beta
+        sigma2 = max((yty - beta @ Xty - u @ Zt_Xy[:, p]) / dof, 1e-300)
+        log_det = np.log(np.abs(lu.U.diagonal())).sum() + np.linalg.slogdet(schur)[1]
+        return beta, schur, sigma2, log_det
+
+    def criterion(log_ratios):
+        _, _, sigma2, log_det = solve(log_ratios)
+        return dof * np.log(sigma2) + float(np.dot(sizes, log_ratios)) + log_det
+
+    fit = optimize.minimize(criterion, np.zeros(len(random)), method='L-BFGS-B',
+                            bounds=[(-20.0, 10.0)] * len(random))
+    solution, schur, sigma2, _ = solve(fit.x)
+    cov = sigma2 * np.linalg.inv(schur)
+
+    z_crit = stats.norm.ppf(0.5 + ci / 2)
+    effects = {}
+    for m, model in enumerate(models):
+        effect = float(solution[2 * m + 1])
+        se = float(np.sqrt(cov[2 * m + 1, 2 * m + 1]))
+        effects[model] = {
+            'intercept': float(solution[2 * m]),
+            'effect': effect,
+            'se': se,
+            'ci': [effect - z_crit * se, effect + z_crit * se],
+            'z': effect / se if se > 0 else None,
+            'p_value': float(2 * stats.norm.sf(abs(effect / se))) if se > 0 else None,
+            'n_obs': int((model_codes == m).sum()),
+        }
+    slopes = {}
+    for j, name in enumerate(covariates):
+        estimate = float(solution[k + j])
+        se = float(np.sqrt(cov[k + j, k + j]))
+        slopes[name] = {
+            'estimate': estimate,
+            'se': se,
+            'p_value': float(2 * stats.norm.sf(abs(estimate / se))) if se > 0 else None,
+        }
+
+    variances = {term: float(sigma2 * np.exp(r)) for term, r in zip(random, fit.x)}
+    variances['residual'] = float(sigma2)
+    return {
+        'n_obs': n,
+        'models': models,
+        'treatment': treatment,
+        'effects': effects,
+        'effect_covariance': cov[1:k:2, 1:k:2].tolist(),
+        'covariates': slopes,
+        'variance_components': variances,
+        'levels': dict(zip(random, sizes)),
+        'reml_criterion': float(fit.fun),
+        'converged': bool(fit.success),
+        'ci': ci,
+    }
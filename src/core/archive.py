@@ -0,0 +1,90 @@
+"""Packed, memory-mapped archive of response texts
+
+An archive directory holds:
+    responses.bin  every response as UTF-8, concatenated
+    offsets.npy    int64 byte offsets, n + 1 entries (row i is [o[i], o[i+1]))
+    index.json     per-row metadata columns (model, prompt_id, condition, category)
+
+Opening an archive maps the blob and offsets read-only, so reading row i
+touches only its own pages and processes opening the same archive share
+the page cache instead of each parsing the result JSON.
+"""
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+BLOB_FILE = "responses.bin"
+OFFSETS_FILE = "offsets.npy"
+INDEX_FILE = "index.json"
+INDEX_COLUMNS = ('model', 'prompt_id', 'condition', 'category')
+
+
+def write_archive(path: str, records: Iterable[Dict]) -> int:
+    """Stream records with a 'response' field (plus metadata) into an archive
+
+    Accepts GeometricTest.results rows, whose prompt_id and category live
+    under 'prompt'. Returns the number of rows written.
+    """
+    os.makedirs(path, exist_ok=True)
+    offsets = [0]
+    columns = {c: [] for c in INDEX_COLUMNS}
+    with open(os.path.join(path, BLOB_FILE), 'wb') as blob:
+        for record in records:
+            encoded = record['response'].encode('utf-8')
+            blob.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            prompt = record.get('prompt') or {}
+            for c in INDEX_COLUMNS:
+                columns[c].append(record.get(c, prompt.get(c)))
+
+    np.save(os.path.join(path, OFFSETS_FILE), np.array(offsets, dtype=np.int64))
+    with open(os.path.join(path, INDEX_FILE), 'w') as f:
+        json.dump(columns, f)
+    return len(offsets) - 1
+
+
+class ResponseArchive:
+    """Read-only view of an archive written by write_archive"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode='r')
+        blob_path = os.path.join(path, BLOB_FILE)
+        # np.memmap refuses zero-length files
+        self.blob = (np.memmap(blob_path, dtype=np.uint8, mode='r')
+                     if os.path.getsize(blob_path) else np.empty(0, dtype=np.uint8))
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index: Dict[str, List] = json.load(f)
+        self._lookup: Dict[str, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def view(self, i: int) -> memoryview:
+        """Row i's UTF-8 bytes, without copying"""
+        return memoryview(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i: int) -> str:
+        return str(self.view(i), 'utf-8')
+
+    def responses(self, rows: Optional[Sequence[int]] = None) -> List[str]:
+        return [self[i] for i in (range(len(self)) if rows is None else rows)]
+
+    def metadata(self, i: int) -> Dict:
+        return {c: self.index[c][i] for c in INDEX_COLUMNS}
+
+    def rows(self, **filters) -> np.ndarray:
+        """Row numbers matching every given column value, e.g. rows(model='haiku')"""
+        selected = None
+        for column, value in filters.items():
+            if column not in self._lookup:
+                lookup = defaultdict(list)
+                for i, v in enumerate(self.index[column]):
+                    lookup[v].append(i)
+                self._lookup[column] = lookup
+            matches = np.array(self._lookup[column].get(value, []), dtype=np.int64)
+            selected = matches if selected is None else np.intersect1d(selected, matches)
+        return np.arange(len(self)) if selected is None else selected
@@ -1,10 +1,10 @@
 """Base classes for curved cognition testing"""
-import numpy as np
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 from datetime import datetime
 import json
+from src.core.online_stats import RunningStats
 
 @dataclass
 class GeometricPrompt:
@@ -22,9 +22,23 @@ class GeometricPrompt:
 class GeometricTest(ABC):
     """Base class for all curved cognition tests"""
     
+    # Maximum value of each score component, for early-stop checks
+    COMPONENT_CAPS: Dict[str, float] = {}
+    # Components whose score depends on response length; a truncated
+    # response scores differently, so these tests never stop early
+    LENGTH_DEPENDENT: Tuple[str, ...] = ()
+    # Bump whenever score_response changes, so memoized scores are not reused
+    SCORER_VERSION = "1"
+    
     def __init__(self, model_name: str = None):
         self.model_name = model_name
         self.results = []
+        # Updated as each result arrives, for live estimates mid-run
+        self.running_stats = RunningStats()
+        
+    @property
+    def scorer_id(self) -> str:
+        return f"{type(self).__name__}_v{self.SCORER_VERSION}"
         
     @abstractmethod
     def generate_prompts(self, n: int) -> List[GeometricPrompt]:
@@ -36,6 +50,11 @@ class GeometricTest(ABC):
         """Score how well response captures curved pattern"""
         pass
         
+    def score_responses(self, prompts: List[GeometricPrompt], responses: List[str]) -> List[Dict[str, float]]:
+        """Score many stored responses without recording results"""
+        score = self.score_response
+        return [score(p, r) for p, r in zip(prompts, responses)]
+        
     def run_test(self, prompts: List[GeometricPrompt], model_func=None) -> Dict:
         """Run complete test battery"""
         test_results = []
@@ -47,39 +66,72 @@ class GeometricTest(ABC):
             else:
                 response = f"Test response for: {prompt.text[:50]}..."
             
-            scores = self.score_response(prompt, response)
-            
-            result = {
-                'prompt': prompt.__dict__,
-                'response': response,
-                'scores': scores,
-                'model': self.model_name,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            test_results.append(result)
-            self.results.append(result)
+            test_results.append(self.record_response(prompt, response))
             
         return self.analyze_results(test_results)
     
+    def record_response(self, prompt: GeometricPrompt, response: str,
+                        scores: Optional[Dict[str, float]] = None, truncated: bool = False) -> Dict:
+        """Score an already generated response and store the result
+
+        Truncated (early-stopped) responses are marked and kept out of the
+        running statistics, so they are never pooled with full responses.
+        """
+        if scores is None:
+            scores = self.score_response(prompt, response)
+        
+        result = {
+            'prompt': prompt.__dict__,
+            'response': response,
+            'scores': scores,
+            'model': self.model_name,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if truncated:
+            result['truncated'] = True
+        self.results.append(result)
+        if 'total' in scores and not truncated:
+            self.running_stats.update(scores['total'])
+        return result
+    
+    def run_responses(self, prompts: List[GeometricPrompt], responses: List[str], store=None) -> Dict:
+        """Score responses generated elsewhere (e.g. by a scheduler)
+
+        With a ResponseStore, each unique response text is scored once.
+        """
+        memo = store.score_test(self, responses) if store is not None else [None] * len(responses)
+        test_results = [self.record_response(p, r, s) for p, r, s in zip(prompts, responses, memo)]
+        return self.analyze_results(test_results)
+    
     def analyze_results(self, results: List[Dict]) -> Dict:
         """Analyze test results"""
         if not results:
             return {'error': 'No results to analyze'}
             
-        # Calculate aggregate scores
-        all_scores = []
+        # Calculate aggregate scores in a single pass; truncated rows separately
+        stats, truncated = RunningStats(), RunningStats()
         for r in results:
             if 'scores' in r and 'total' in r['scores']:
-                all_scores.append(r['scores']['total'])
+                (truncated if r.get('truncated') else stats).update(r['scores']['total'])
         
-        if all_scores:
-            return {
-                'mean_score': np.mean(all_scores),
-                'std_score': np.std(all_scores),
-                'min_score': np.min(all_scores),
-                'max_score': np.max(all_scores),
-                'n_tests': len(all_scores),
-                'model': self.model_name
-            }
-        return {'error': 'No valid scores found'}
+        summary = self._summarize(stats) if stats.n else {'error': 'No valid scores found'}
+        if truncated.n:
+            summary['truncated'] = self._summarize(truncated)
+        return summary
+    
+    def current_estimates(self) -> Dict:
+        """O(1) snapshot of all results recorded so far"""
+        if not self.running_stats.n:
+            return {'error': 'No valid scores found'}
+        return self._summarize(self.running_stats)
+    
+    def _summarize(self, stats: RunningStats) -> Dict:
+        return {
+            'mean_score': stats.mean,
+            'std_score': stats.std(),
+            'min_score': stats.min,
+            'max_score': stats.max,
+            'n_tests': stats.n,
+            'model': self.model_name
+        }
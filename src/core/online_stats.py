@@ -0,0 +1,122 @@
+"""Streaming statistics updated one result at a time"""
+import math
+from typing import Dict, Iterable, Optional
+
+
+class RunningStats:
+    """Welford mean/variance plus min/max in O(1) per update
+
+    Variance defaults to ddof=0 to match np.var/np.std as used in
+    analyze_results and the experiment scripts.
+    """
+
+    def __init__(self, values: Optional[Iterable[float]] = None):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        if values is not None:
+            self.extend(values)
+
+    def update(self, x: float):
+        x = float(x)
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def extend(self, values: Iterable[float]):
+        for x in values:
+            self.update(x)
+
+    def merge(self, other: 'RunningStats') -> 'RunningStats':
+        """Combine with stats from another shard (Chan et al.)"""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def variance(self, ddof: int = 0) -> float:
+        if self.n - ddof <= 0:
+            return math.nan
+        return self.m2 / (self.n - ddof)
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.variance(ddof))
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'n': self.n,
+            'mean': self.mean if self.n else math.nan,
+            'std': self.std(),
+            'min': self.min if self.n else math.nan,
+            'max': self.max if self.n else math.nan,
+        }
+
+
+def cohens_d(linear: RunningStats, spiral: RunningStats) -> float:
+    """Cohen's d with the pooled SD used throughout the experiments"""
+    pooled_std = math.sqrt((linear.variance() + spiral.variance()) / 2)
+    return (linear.mean - spiral.mean) / pooled_std if pooled_std > 0 else 0.0
+
+
+class PairedRunningStats:
+    """Running linear vs spiral comparison for matched pairs
+
+    Tracks both conditions and the per-pair difference, so the paired t
+    statistic (as scipy.stats.ttest_rel) and Cohen's d can be read at any
+    point in a run without re-scanning results.
+    """
+
+    def __init__(self):
+        self.linear = RunningStats()
+        self.spiral = RunningStats()
+        self.difference = RunningStats()
+
+    @property
+    def n(self) -> int:
+        return self.difference.n
+
+    def update(self, linear_score: float, spiral_score: float):
+        self.linear.update(linear_score)
+        self.spiral.update(spiral_score)
+        self.difference.update(linear_score - spiral_score)
+
+    @property
+    def cohens_d(self) -> float:
+        return cohens_d(self.linear, self.spiral)
+
+    @property
+    def t_statistic(self) -> float:
+        if self.n < 2:
+            return math.nan
+        se = self.difference.std(ddof=1) / math.sqrt(self.n)
+        if se == 0:
+            return math.nan
+        return self.difference.mean / se
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'n_pairs': self.n,
+            'linear_mean': self.linear.mean,
+            'linear_sd': self.linear.std(),
+            'spiral_mean': self.spiral.mean,
+            'spiral_sd': self.spiral.std(),
+            'difference': self.difference.mean,
+            'difference_sd': self.difference.std(ddof=1),
+            't_statistic': self.t_statistic,
+            'cohens_d': self.cohens_d,
+        }
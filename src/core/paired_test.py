@@ -0,0 +1,115 @@
+"""Matched linear/spiral pairs run, stored and analysed as single units"""
+import math
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from scipy import stats
+
+from src.core.geometric_tests import GeometricPrompt, GeometricTest
+from src.core.online_stats import PairedRunningStats
+
+
+def pair_id(linear: GeometricPrompt, spiral: GeometricPrompt, sample: int = 0) -> str:
+    """Identifier shared by both members of a pair, the same for every model"""
+    base = f"{linear.prompt_id}|{spiral.prompt_id}"
+    return f"{base}#{sample}" if sample else base
+
+
+class PairedTest:
+    """Score (linear, spiral) pairs together so differences are paired by construction
+
+    A pair is recorded only when both members have a response; a pair with a
+    failed member is counted in `failed` and neither response is scored.
+    """
+
+    def __init__(self, linear_test: GeometricTest, spiral_test: GeometricTest,
+                 model_name: Optional[str] = None):
+        self.linear_test = linear_test
+        self.spiral_test = spiral_test
+        self.model_name = model_name or linear_test.model_name
+        self.pairs: List[Dict] = []
+        self.failed: Dict[str, str] = {}  # pair_id -> error
+        self.stats = PairedRunningStats()
+
+    def record_pair(self, pair: str, linear: GeometricPrompt, linear_response: str,
+                    spiral: GeometricPrompt, spiral_response: str) -> Dict:
+        """Score both members and update the running paired statistics"""
+        linear_result = self.linear_test.record_response(linear, linear_response)
+        spiral_result = self.spiral_test.record_response(spiral, spiral_response)
+        linear_result['pair_id'] = spiral_result['pair_id'] = pair
+        linear_score = linear_result['scores']['total']
+        spiral_score = spiral_result['scores']['total']
+        self.stats.update(linear_score, spiral_score)
+        record = {'pair_id': pair, 'linear': linear_score, 'spiral': spiral_score,
+                  'difference': linear_score - spiral_score}
+        self.pairs.append(record)
+        return record
+
+    def record_failure(self, pair: str, error: str):
+        self.failed[pair] = error
+
+    def record_jobs(self, jobs: Sequence, linear: str = 'linear', spiral: str = 'spiral') -> int:
+        """Record scheduler jobs (with pair_id set) for this model; returns pairs recorded"""
+        members: Dict[str, Dict] = {}
+        for job in jobs:
+            if job.model == self.model_name and job.pair_id is not None:
+                members.setdefault(job.pair_id, {})[job.condition] = job
+        recorded = 0
+        for pair, by_condition in members.items():
+            first, second = by_condition.get(linear), by_condition.get(spiral)
+            if first is None or second is None:
+                continue
+            error = first.error or second.error
+            if error is not None:
+                self.record_failure(pair, error)
+                continue
+            self.record_pair(pair, first.prompt, first.response, second.prompt, second.response)
+            recorded += 1
+        return recorded
+
+    def run_pairs(self, pairs: Sequence[Tuple[GeometricPrompt, GeometricPrompt]],
+                  model_func: Callable[[str], str], max_pairs: int = 4,
+                  on_pair: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Generate both members of each pair concurrently and record pairs as they finish
+
+        Up to `max_pairs` pairs are in flight at once; each pair costs one
+        round trip instead of two.
+        """
+        with ThreadPoolExecutor(max_workers=2 * max(1, max_pairs)) as pool:
+            in_flight = {}
+            for linear, spiral in pairs:
+                # Adjacent submissions, so both members start together
+                futures = (pool.submit(model_func, linear.text), pool.submit(model_func, spiral.text))
+                in_flight[pair_id(linear, spiral)] = (linear, spiral) + futures
+            while in_flight:
+                done = [p for p, (_, _, a, b) in in_flight.items() if a.done() and b.done()]
+                if not done:
+                    wait([f for _, _, a, b in in_flight.values() for f in (a, b)
+                          if not f.done()], return_when=FIRST_COMPLETED)
+                    continue
+                for pair in done:
+                    linear, spiral, a, b = in_flight.pop(pair)
+                    error = a.exception() or b.exception()
+                    if error is not None:
+                        self.record_failure(pair, str(error))
+                        continue
+                    record = self.record_pair(pair, linear, a.result(), spiral, b.result())
+                    if on_pair:
+                        on_pair(record)
+        return self.summary()
+
+    def scores(self, pairs: Optional[Sequence[str]] = None) -> Dict[str, List[float]]:
+        """{'linear': [...], 'spiral': [...]} in `pairs` order (default: recording order)"""
+        by_id = {p['pair_id']: p for p in self.pairs}
+        order = list(by_id) if pairs is None else pairs
+        return {'linear': [by_id[p]['linear'] for p in order],
+                'spiral': [by_id[p]['spiral'] for p in order]}
+
+    def summary(self) -> Dict:
+        """Paired statistics so far, with the two-sided ttest_rel p-value"""
+        summary = self.stats.summary()
+        t = summary['t_statistic']
+        summary['p_value'] = 2 * stats.t.sf(abs(t), self.stats.n - 1) if not math.isnan(t) else math.nan
+        summary['n_failed'] = len(self.failed)
+        summary['model'] = self.model_name
+        return summary
@@ -0,0 +1,132 @@
+"""Multi-process re-scoring of stored responses"""
+import math
+import os
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from src.core.archive import ResponseArchive
+from src.core.geometric_tests import GeometricTest, GeometricPrompt
+
+# score_response implementations don't look at the prompt; used when none given
+PLACEHOLDER_PROMPT = GeometricPrompt(text="", category="rescore", complexity=0,
+                                     expected_pattern="", prompt_id="rescore")
+
+# Per-worker state, attached once in the pool initializer
+_worker = {}
+
+
+def pack_responses(responses: List[str]) -> Tuple[bytes, np.ndarray]:
+    """Concatenate responses into one UTF-8 blob plus n+1 byte offsets"""
+    encoded = [r.encode('utf-8') for r in responses]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return b''.join(encoded), offsets
+
+
+def _init_worker(test_class, components, blob_name, offsets_name, n_offsets):
+    blob = shared_memory.SharedMemory(name=blob_name)
+    offsets = shared_memory.SharedMemory(name=offsets_name)
+    _worker.update(
+        test=test_class(),
+        components=components,
+        shm=(blob, offsets),
+        blob=blob.buf,
+        offsets=np.ndarray((n_offsets,), dtype=np.int64, buffer=offsets.buf),
+    )
+
+
+def _init_archive_worker(test_class, components, archive_path):
+    archive = ResponseArchive(archive_path)
+    _worker.update(
+        test=test_class(),
+        components=components,
+        blob=archive.blob,
+        offsets=archive.offsets,
+    )
+
+
+def _score_shard(task) -> np.ndarray:
+    rows, prompts = task
+    test, components = _worker['test'], _worker['components']
+    blob, offsets = _worker['blob'], _worker['offsets']
+    out = np.empty((len(rows), len(components)), dtype=np.float64)
+    for row, i in enumerate(rows):
+        text = str(blob[offsets[i]:offsets[i + 1]], 'utf-8')
+        prompt = prompts[row] if prompts else PLACEHOLDER_PROMPT
+        scores = test.score_response(prompt, text)
+        out[row] = [scores[c] for c in components]
+    return out
+
+
+class ParallelScorer:
+    """Shard a stored response set across a process pool
+
+    Responses are packed once into shared memory (a UTF-8 blob and an
+    offsets array), or read from a memory-mapped ResponseArchive; workers
+    attach in their initializer, so each task only carries a row range. Per-shard score arrays come back in
+    shard order and are stacked into one (n_responses x n_components) array.
+    """
+
+    def __init__(self, test_class: Type[GeometricTest], workers: Optional[int] = None,
+                 shard_size: Optional[int] = None):
+        self.test_class = test_class
+        self.workers = workers
+        self.shard_size = shard_size
+        # Component order is fixed by the scorer's dict order
+        self.components = list(test_class().score_response(PLACEHOLDER_PROMPT, "").keys())
+
+    def _shards(self, n: int, workers: int) -> List[Tuple[int, int]]:
+        size = self.shard_size or max(1, math.ceil(n / (workers * 4)))
+        return [(i, min(n, i + size)) for i in range(0, n, size)]
+
+    def score_matrix(self, responses: List[str],
+                     prompts: Optional[List[GeometricPrompt]] = None) -> np.ndarray:
+        """Scores as an array with one column per entry in self.components"""
+        if not responses:
+            return np.empty((0, len(self.components)))
+        blob, offsets = pack_responses(responses)
+        return self._score_packed(blob, offsets, prompts)
+
+    def _score_packed(self, blob, offsets: np.ndarray,
+                      prompts: Optional[List[GeometricPrompt]] = None) -> np.ndarray:
+        n = len(offsets) - 1
+        workers = self.workers or os.cpu_count() or 1
+        blob_shm = shared_memory.SharedMemory(create=True, size=max(1, len(blob)))
+        offsets_shm = shared_memory.SharedMemory(create=True, size=offsets.nbytes)
+        try:
+            blob_shm.buf[:len(blob)] = blob
+            np.ndarray(offsets.shape, dtype=np.int64, buffer=offsets_shm.buf)[:] = offsets
+
+            with Pool(workers, initializer=_init_worker,
+                      initargs=(self.test_class, self.components,
+                                blob_shm.name, offsets_shm.name, len(offsets))) as pool:
+                tasks = [(range(start, end), prompts[start:end] if prompts else None)
+                         for start, end in self._shards(n, workers)]
+                shards = pool.map(_score_shard, tasks, chunksize=1)
+        finally:
+            blob_shm.close()
+            blob_shm.unlink()
+            offsets_shm.close()
+            offsets_shm.unlink()
+        return np.vstack(shards)
+
+    def score_archive(self, path: str, rows: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Score rows of a ResponseArchive (all by default) straight from its mapped files"""
+        n = len(ResponseArchive(path))
+        rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return np.empty((0, len(self.components)))
+        workers = self.workers or os.cpu_count() or 1
+        with Pool(workers, initializer=_init_archive_worker,
+                  initargs=(self.test_class, self.components, path)) as pool:
+            tasks = [(rows[start:end], None) for start, end in self._shards(len(rows), workers)]
+            shards = pool.map(_score_shard, tasks, chunksize=1)
+        return np.vstack(shards)
+
+    def score(self, responses: List[str],
+              prompts: Optional[List[GeometricPrompt]] = None) -> List[Dict[str, float]]:
+        """Same output as GeometricTest.score_responses, computed in parallel"""
+        matrix = self.score_matrix(responses, prompts)
+        return [dict(zip(self.components, row)) for row in matrix.tolist()]
@@ -0,0 +1,170 @@
+"""MinHash-LSH index over stored responses for similarity and near-duplicate queries
+
+Each response is reduced to word shingles, hashed into a MinHash
+signature, and bucketed by signature bands. Queries only compare against
+responses sharing a band bucket, so lookup cost depends on the number of
+similar responses rather than on the archive size, and responses can be
+added one at a time as results stream in.
+"""
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text: str, k: int = 3) -> np.ndarray:
+    """CRC32 hashes of the lowercase word k-grams of text"""
+    words = text.lower().split()
+    if len(words) < k:
+        grams = [' '.join(words)]
+    else:
+        grams = [' '.join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.unique(np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams),
+                                 dtype=np.uint64, count=len(grams)))
+
+
+class MinHasher:
+    """MinHash signatures using multiply-shift hashing of 32-bit shingle hashes"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Odd multipliers; uint64 arithmetic wraps, the top 32 bits are the hash
+        self.a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        hashed = (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(32)
+        return (hashed & MASK32).min(axis=1).astype(np.uint32)
+
+
+class ResponseIndex:
+    """Incremental LSH index of response texts with their result metadata
+
+    With `bands` bands of num_perm / bands rows, two responses with Jaccard
+    similarity s become candidates with probability 1 - (1 - s^rows)^bands.
+    The defaults (128 permutations, 32 bands of 4) make pairs above ~0.5
+    likely candidates; candidates are then ranked by estimated Jaccard.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle_size: int = 3, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(bands)]
+        # Grown by doubling so adds stay amortized O(1); rows past n_docs are unused
+        self._signatures = np.empty((64, num_perm), dtype=np.uint32)
+        self.n_docs = 0
+        self.records: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _signature(self, text: str) -> np.ndarray:
+        return self.hasher.signature(shingles(text, self.shingle_size))
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    @property
+    def signatures(self) -> np.ndarray:
+        """(n_docs, num_perm) view of the stored signatures"""
+        return self._signatures[:self.n_docs]
+
+    def add(self, text: str, **metadata) -> int:
+        """Index one response; returns its id"""
+        doc_id = len(self.records)
+        signature = self._signature(text)
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            band[key].append(doc_id)
+        if doc_id == len(self._signatures):
+            grown = np.empty((2 * doc_id, self._signatures.shape[1]), dtype=np.uint32)
+            grown[:doc_id] = self._signatures
+            self._signatures = grown
+        self._signatures[doc_id] = signature
+        self.n_docs = doc_id + 1
+        self.records.append(dict(metadata, response=text))
+        return doc_id
+
+    def add_result(self, result: Dict) -> int:
+        """Index a result dict as produced by GeometricTest.record_response"""
+        prompt = result.get('prompt', {})
+        return self.add(result['response'], model=result.get('model'),
+                        prompt_id=prompt.get('prompt_id'), category=prompt.get('category'))
+
+    def add_results(self, results: Iterable[Dict]) -> List[int]:
+        return [self.add_result(r) for r in results]
+
+    def _candidates(self, signature: np.ndarray, exclude: Optional[int] = None) -> np.ndarray:
+        found = set()
+        for band, key in zip(self.buckets, self._band_keys(signature)):
+            found.update(band.get(key, ()))
+        found.discard(exclude)
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def _ranked(self, signature: np.ndarray, candidates: np.ndarray,
+                k: Optional[int], threshold: float) -> List[Tuple[int, float]]:
+        if not len(candidates):
+            return []
+        estimates = (self._signatures[candidates] == signature).mean(axis=1)
+        order = np.argsort(-estimates, kind='stable')
+        ranked = [(int(candidates[i]), float(estimates[i])) for i in order if estimates[i] >= threshold]
+        return ranked[:k] if k else ranked
+
+    def similar(self, text: str, k: int = 10, threshold: float = 0.0) -> List[Tuple[int, float]]:
+        """(id, estimated Jaccard) of indexed responses similar to text, best first"""
+        signature = self._signature(text)
+        return self._ranked(signature, self._candidates(signature), k, threshold)
+
+    def similar_to(self, doc_id: int, k: int = 10, threshold: float = 0.0) -> List[Tuple[int, float]]:
+        signature = self.signatures[doc_id]
+        return self._ranked(signature, self._candidates(signature, exclude=doc_id), k, threshold)
+
+    def near_duplicates(self, threshold: float = 0.8) -> List[List[int]]:
+        """Groups of responses connected by estimated Jaccard >= threshold"""
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        signatures = self.signatures
+        # Identical signatures are duplicates outright; keep one representative
+        first_seen = {}
+        representative = [first_seen.setdefault(signature.tobytes(), i) for i, signature in enumerate(signatures)]
+        parent = list(representative)
+
+        for band in self.buckets:
+            for ids in band.values():
+                if len(ids) < 2:
+                    continue
+                ids = np.unique([representative[i] for i in ids])
+                if len(ids) < 2:
+                    continue
+                block = signatures[ids]
+                for row in range(len(ids) - 1):
+                    matches = (block[row + 1:] == block[row]).mean(axis=1) >= threshold
+                    for j in ids[row + 1:][matches]:
+                        parent[find(j)] = find(ids[row])
+
+        groups = defaultdict(list)
+        for i in range(len(self.records)):
+            groups[find(i)].append(i)
+        return sorted((g for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+    def collapse_by_model(self, threshold: float = 0.8) -> Dict[str, float]:
+        """Per model, the fraction of its responses that have a near-duplicate"""
+        totals = defaultdict(int)
+        for record in self.records:
+            totals[record.get('model')] += 1
+        duplicated = defaultdict(int)
+        for group in self.near_duplicates(threshold):
+            for i in group:
+                duplicated[self.records[i].get('model')] += 1
+        return {model: duplicated[model] / n for model, n in totals.items()}
@@ -0,0 +1,112 @@
+"""Content-addressed response storage with a memo of scores per scorer version
+
+Each distinct response text is stored once under its SHA-256. Scores are
+memoized per (scorer id, hash), so re-scoring an archive full of repeated
+texts (identical refusals, "Error: ..." strings, cycled prompts answered
+the same way) runs each scorer once per unique text. Scorers are assumed
+to depend only on the response text, which holds for every
+score_response in src/tests.
+"""
+import hashlib
+import json
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.core.geometric_tests import GeometricPrompt, GeometricTest
+
+# score_response implementations don't look at the prompt
+_MEMO_PROMPT = GeometricPrompt(text="", category="memo", complexity=0,
+                               expected_pattern="", prompt_id="memo")
+
+
+def response_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResponseStore:
+    """SQLite-backed store of unique responses and memoized scores"""
+
+    def __init__(self, path: str = ":memory:", metrics=None):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS responses (hash TEXT PRIMARY KEY, text TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " scorer TEXT, hash TEXT, scores TEXT NOT NULL, PRIMARY KEY (scorer, hash));"
+        )
+        self.metrics = metrics  # optional RunMetrics; memo lookups count as cache hits/misses
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        self.conn.close()
+
+    def _select(self, query: str, prefix: list, keys: Sequence[str]) -> List[tuple]:
+        rows = []
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 900):
+            chunk = list(keys[start:start + 900])
+            rows.extend(self.conn.execute(query.format(','.join('?' * len(chunk))), prefix + chunk))
+        return rows
+
+    def put_many(self, texts: Sequence[str]) -> List[str]:
+        """Store texts (each unique text once); returns their hashes in order"""
+        hashes = [response_hash(t) for t in texts]
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO responses VALUES (?, ?)",
+                                  dict(zip(hashes, texts)).items())
+        return hashes
+
+    def put(self, text: str) -> str:
+        return self.put_many([text])[0]
+
+    def texts(self, hashes: Sequence[str]) -> List[Optional[str]]:
+        found = dict(self._select("SELECT hash, text FROM responses WHERE hash IN ({})", [],
+                                  list(set(hashes))))
+        return [found.get(h) for h in hashes]
+
+    def get(self, response_hash: str) -> Optional[str]:
+        return self.texts([response_hash])[0]
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def score_many(self, scorer: str, texts: Sequence[str],
+                   score_batch: Callable[[List[str]], List[Dict[str, float]]]) -> List[Dict[str, float]]:
+        """Scores for texts, calling score_batch only on unique texts not yet memoized
+
+        `scorer` must change whenever the scoring logic does, e.g.
+        GeometricTest.scorer_id or a CompiledScorer name.
+        """
+        hashes = self.put_many(texts)
+        unique = list(dict.fromkeys(hashes))
+        memo = {h: json.loads(s) for h, s in self._select(
+            "SELECT hash, scores FROM scores WHERE scorer = ? AND hash IN ({})", [scorer], unique)}
+
+        missing = [h for h in unique if h not in memo]
+        if missing:
+            by_hash = dict(zip(hashes, texts))
+            computed = score_batch([by_hash[h] for h in missing])
+            memo.update(zip(missing, computed))
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                                      [(scorer, h, json.dumps(s)) for h, s in zip(missing, computed)])
+
+        # Every row whose text was already scored counts as a hit
+        misses = len(missing)
+        self.hits += len(texts) - misses
+        self.misses += misses
+        if self.metrics:
+            self.metrics.record_cache(True, len(texts) - misses)
+            self.metrics.record_cache(False, misses)
+        return [memo[h] for h in hashes]
+
+    def score_test(self, test: GeometricTest, responses: Sequence[str]) -> List[Dict[str, float]]:
+        """Memoized test.score_response over responses"""
+        return self.score_many(test.scorer_id, responses,
+                               lambda texts: [test.score_response(_MEMO_PROMPT, t) for t in texts])
+
+    def score_compiled(self, scorer, responses: Sequence[str]) -> List[Dict[str, float]]:
+        """Memoized CompiledScorer (scoring_rules) batch evaluation"""
+        return self.score_many(scorer.name, responses,
+                               lambda texts: [dict(zip(scorer.components, row))
+                                              for row in scorer.score_batch(texts).tolist()])
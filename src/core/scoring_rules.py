@@ -0,0 +1,371 @@
+"""Declarative scoring rules compiled into vectorized evaluators
+
+A scorer spec (see data/scorers/*.json) lists components built from
+lexicon terms, caps, weights, count thresholds and length bands, plus
+penalties on the total. Specs compile once into index arrays over a shared
+term vocabulary. Scoring a batch looks terms up in a TermPresence, which
+searches a text for a term only while an evaluator still needs the answer.
+An any-of group stops at a text's first hit, and later conjuncts, longer
+terms and penalty exceptions only search texts that can still match,
+the same short-circuits as the hand-coded score_response methods.
+Large batches of short texts are instead searched for every term up
+front, as one byte array with vectorized numpy passes. The rest is numpy
+arithmetic per scorer. spiral_v1 and linear_v1 reproduce the hand-coded
+score_response methods exactly.
+"""
+import glob
+import json
+import os
+from itertools import repeat
+from operator import contains
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SCORERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           "data", "scorers")
+
+# Joins a batch into one searchable byte array; no term contains it
+_SEPARATOR = '\x00'
+
+# The byte-array search only beats per-text substring scans for many short texts
+_ARRAY_MIN_TEXTS = 300
+_ARRAY_MAX_MEAN_CHARS = 400
+
+
+class TermVocabulary:
+    """Unique lowercase substrings shared by all compiled scorers"""
+
+    def __init__(self):
+        self.terms: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._contained: Dict[Tuple[int, ...], Dict[int, List[int]]] = {}
+
+    def add(self, term: str) -> int:
+        term = term.lower()
+        if term not in self.index:
+            self.index[term] = len(self.terms)
+            self.terms.append(term)
+        return self.index[term]
+
+    def contained(self, columns: Tuple[int, ...]) -> Dict[int, List[int]]:
+        """Other terms among `columns` that each term contains, longest first
+
+        A term can only occur in texts where the terms it contains occur, so
+        'remembering' need only be searched for where 'remember' was found.
+        """
+        if columns not in self._contained:
+            inner = {}
+            for j in columns:
+                shorter = [k for k in columns if k != j and self.terms[k] in self.terms[j]]
+                if shorter:
+                    inner[j] = sorted(shorter, key=lambda k: -len(self.terms[k]))
+            self._contained[columns] = inner
+        return self._contained[columns]
+
+    def search(self, lowered: Sequence[str], columns: Optional[Sequence[int]] = None) -> Optional[np.ndarray]:
+        """(n_terms x n_texts) bool matrix: term occurs as a substring
+
+        Only `columns` are searched if given; the rest stay False. The batch
+        is encoded once as a UTF-8 byte array. Byte-level matches of a UTF-8
+        term are exactly its character-level matches. Each term is anchored
+        on its least frequent byte in the batch. One vectorized pass per
+        anchor byte finds the candidate positions, and the term's other bytes
+        narrow them, rarest first. Hits map to texts through the separator
+        positions. Returns None if a text contains the separator byte, since
+        matches could then span texts.
+        """
+        n = len(lowered)
+        matrix = np.zeros((len(self.terms), n), dtype=bool)
+        columns = range(len(self.terms)) if columns is None else columns
+        data = np.frombuffer(_SEPARATOR.join(lowered).encode('utf-8'), dtype=np.uint8)
+        bounds = np.flatnonzero(data == 0)
+        if len(bounds) != max(0, n - 1):
+            return None
+
+        # Anchor each term on its rarest byte in this batch, so candidate lists stay short
+        frequency = np.bincount(data, minlength=256)
+        by_anchor: Dict[int, List[Tuple[int, np.ndarray, np.ndarray]]] = {}
+        for j in columns:
+            pattern = np.frombuffer(self.terms[j].encode('utf-8'), dtype=np.uint8)
+            if not len(pattern):
+                matrix[j] = n > 0
+                continue
+            order = np.argsort(frequency[pattern], kind='stable')
+            by_anchor.setdefault(int(pattern[order[0]]), []).append((j, pattern, order))
+        for anchor, group in by_anchor.items():
+            positions = np.flatnonzero(data == anchor)
+            for j, pattern, order in group:
+                # Candidate start positions of the whole term
+                candidates = positions - order[0]
+                candidates = candidates[(candidates >= 0) & (candidates <= len(data) - len(pattern))]
+                for k in order[1:].tolist():
+                    candidates = candidates[data[candidates + k] == pattern[k]]
+                    if not len(candidates):
+                        break
+                # Separators before a match = index of the text it is in
+                matrix[j, np.searchsorted(bounds, candidates)] = True
+        return matrix
+
+
+def _contains(texts: Iterable[str], term: str) -> np.ndarray:
+    return np.frombuffer(bytes(map(contains, texts, repeat(term))), dtype=bool)
+
+
+class TermPresence:
+    """Which vocabulary terms occur in which texts of one batch, searched on demand
+
+    column() answers for a subset of rows and only searches texts it hasn't
+    looked at before, so evaluators can short-circuit per text. Batches of
+    many short texts are searched for all of `columns` up front with
+    TermVocabulary.search instead.
+    """
+
+    def __init__(self, vocabulary: TermVocabulary, lowered: Sequence[str],
+                 columns: Optional[Sequence[int]] = None):
+        self.vocabulary = vocabulary
+        self.lowered = lowered
+        self.n = len(lowered)
+        columns = tuple(range(len(vocabulary.terms)) if columns is None else columns)
+        self.contained = vocabulary.contained(columns)
+        self.values = np.zeros((len(vocabulary.terms), self.n), dtype=bool)
+        self.complete = set()  # columns known for every text
+        self.partial = set()  # columns known for the texts marked in `searched`
+        self.searched = np.zeros_like(self.values)
+        self._joined: Optional[str] = None
+        if self.n >= _ARRAY_MIN_TEXTS and sum(map(len, lowered)) <= _ARRAY_MAX_MEAN_CHARS * self.n:
+            matrix = vocabulary.search(lowered, columns)
+            if matrix is not None:
+                self.values = matrix
+                self.complete.update(columns)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def column(self, j: int, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether term j occurs in each text of `rows` (every text if None)"""
+        if j not in self.complete:
+            if rows is None:
+                self._search(j, (~self.searched[j]).nonzero()[0] if j in self.partial else None)
+                self.complete.add(j)
+            else:
+                unsearched = rows[~self.searched[j, rows]] if j in self.partial else rows
+                if len(unsearched):
+                    self._search(j, unsearched)
+                    self.searched[j, unsearched] = True
+                    self.partial.add(j)
+        return self.values[j] if rows is None else self.values[j, rows]
+
+    def _search(self, j: int, rows: Optional[np.ndarray]):
+        term = self.vocabulary.terms[j]
+        # Only texts containing an already searched inner term can contain this one
+        inner = next((k for k in self.contained.get(j, ()) if k in self.complete), None)
+        if inner is not None:
+            found = self.column(inner, rows)
+            rows = found.nonzero()[0] if rows is None else rows[found]
+        elif rows is None:
+            if self._joined is None:
+                self._joined = _SEPARATOR.join(self.lowered)
+            # Terms no text contains are common, and cost one scan of the joined batch
+            if term in self._joined:
+                self.values[j] = _contains(self.lowered, term)
+            return
+        self.values[j, rows] = _contains(map(self.lowered.__getitem__, rows.tolist()), term)
+
+    def any_of(self, columns: Sequence[int], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether any of the terms occurs, searching each text only until its first hit"""
+        if len(columns) == 1:
+            return self.column(columns[0], rows)
+        hit = np.zeros(self.n if rows is None else len(rows), dtype=bool)
+        pending = None  # positions in rows still without a hit, None for all
+        for j in columns:
+            if pending is None:
+                hit |= self.column(j, rows)
+                pending = (~hit).nonzero()[0]
+            else:
+                found = self.column(j, pending if rows is None else rows[pending])
+                hit[pending[found]] = True
+                pending = pending[~found]
+            if not len(pending):
+                break
+        return hit
+
+    def satisfied(self, groups: Sequence[Sequence[int]], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether every any-of group matches; later groups only search texts that passed the earlier ones"""
+        if len(groups) == 1:
+            return self.any_of(groups[0], rows)
+        mask = self.any_of(groups[0], rows).copy()
+        for group in groups[1:]:
+            passed = mask.nonzero()[0]
+            if not len(passed):
+                break
+            mask[passed] = self.any_of(group, passed if rows is None else rows[passed])
+        return mask
+
+
+def _word_counts(responses: Sequence[str]) -> np.ndarray:
+    return np.fromiter((len(r.split()) for r in responses), dtype=int, count=len(responses))
+
+
+def _term_groups(term: Dict) -> List[List[str]]:
+    """Normalize a term to a conjunction of any-of groups"""
+    if 'groups' in term:
+        return term['groups']
+    if 'all' in term:
+        return [[word] for word in term['all']]
+    if 'any' in term:
+        return [term['any']]
+    raise ValueError(f"Term needs 'all', 'any' or 'groups': {term}")
+
+
+class CompiledScorer:
+    """One scorer spec compiled against a TermVocabulary"""
+
+    def __init__(self, spec: Dict, vocabulary: TermVocabulary):
+        self.spec = spec
+        self.name = f"{spec['name']}_{spec['version']}"
+        self.vocabulary = vocabulary
+        self.components = [c['name'] for c in spec['components']] + ['total']
+        self.columns = set()  # vocabulary terms this scorer reads
+        self.needs_word_counts = False
+        self._evaluators = [self._compile_component(c) for c in spec['components']]
+        self._penalties = [self._compile_penalty(p) for p in spec.get('penalties', [])]
+
+    def _add(self, term: str) -> int:
+        column = self.vocabulary.add(term)
+        self.columns.add(column)
+        return column
+
+    def _groups(self, groups: List[List[str]]) -> List[List[int]]:
+        return [[self._add(w) for w in group] for group in groups]
+
+    def _compile_component(self, c: Dict):
+        if 'word_count_below' in c:
+            self.needs_word_counts = True
+            bands = c['word_count_below']
+            default = c.get('default', 0.0)
+
+            def evaluate(presence, word_counts):
+                return np.select([word_counts < limit for limit, _ in bands],
+                                 [value for _, value in bands], default)
+            return evaluate
+
+        if 'count' in c:
+            columns = [self._add(w) for w in c['count']]
+            thresholds = c['thresholds']
+
+            def evaluate(presence, word_counts):
+                hits = np.sum([presence.column(j) for j in columns], axis=0)
+                return np.select([hits >= t for t, _ in thresholds],
+                                 [value for _, value in thresholds], 0.0)
+            return evaluate
+
+        if 'each' in c:
+            terms = [{'all': [word], 'weight': c['weight']} for word in c['each']]
+        else:
+            terms = c['terms']
+        compiled = [(self._groups(_term_groups(t)), t['weight']) for t in terms]
+        weights = np.array([t['weight'] for t in terms], dtype=float)
+        cap = c.get('cap')
+        first = c.get('mode', 'sum') == 'first'
+
+        def evaluate(presence, word_counts):
+            score = np.zeros(len(presence))
+            if first:
+                # Later terms are only checked for texts no earlier term matched
+                pending = None
+                for groups, weight in compiled:
+                    matched = presence.satisfied(groups, pending)
+                    score[matched if pending is None else pending[matched]] = weight
+                    pending = np.flatnonzero(~matched) if pending is None else pending[~matched]
+                    if not len(pending):
+                        break
+            elif compiled:
+                # cumsum adds in spec order, so floats match the sequential hand-coded sums
+                matched = np.array([presence.satisfied(groups) for groups, _ in compiled])
+                score = np.cumsum(matched * weights[:, None], axis=0)[-1]
+            return np.minimum(score, cap) if cap is not None else score
+        return evaluate
+
+    def _compile_penalty(self, p: Dict) -> Tuple[str, int, int, List[int], float]:
+        unless = [self._add(w) for w in p.get('unless_any', [])]
+        term = p['occurrences'].lower()
+        return term, self._add(term), p['more_than'], unless, p['amount']
+
+    def evaluate(self, lowered: Sequence[str], presence: TermPresence,
+                 word_counts: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n_texts x n_components) scores, last column is the total"""
+        n = len(lowered)
+        out = np.empty((n, len(self.components)))
+        total = np.zeros(n)
+        for i, evaluate in enumerate(self._evaluators):
+            out[:, i] = evaluate(presence, word_counts)
+            total = total + out[:, i]
+        for term, column, more_than, unless, amount in self._penalties:
+            # Occurrences are only counted where the term is present at all
+            counts = np.zeros(n, dtype=int)
+            present = np.flatnonzero(presence.column(column))
+            counts[present] = [lowered[i].count(term) for i in present.tolist()]
+            applies = counts > more_than
+            if unless:
+                rows = np.flatnonzero(applies)
+                applies[rows] = ~presence.any_of(unless, rows)
+            total = np.where(applies, np.maximum(0.0, total - amount), total)
+        out[:, -1] = total
+        return out
+
+    def score_batch(self, responses: Sequence[str]) -> np.ndarray:
+        lowered = [r.lower() for r in responses]
+        word_counts = _word_counts(responses) if self.needs_word_counts else None
+        return self.evaluate(lowered, TermPresence(self.vocabulary, lowered, sorted(self.columns)), word_counts)
+
+    def score(self, response: str) -> Dict[str, float]:
+        """score_response-compatible dict for one response"""
+        return dict(zip(self.components, self.score_batch([response])[0].tolist()))
+
+
+class ScorerRegistry:
+    """Named scorer versions sharing one term vocabulary
+
+    score_all() lowercases each response once and evaluates every requested
+    scorer against one shared TermPresence, so a term two versions share is
+    searched for once per text. That makes A/B comparisons of scorer
+    versions on large archives nearly as cheap as scoring with one.
+    """
+
+    def __init__(self):
+        self.vocabulary = TermVocabulary()
+        self.scorers: Dict[str, CompiledScorer] = {}
+
+    def register(self, spec: Dict) -> CompiledScorer:
+        scorer = CompiledScorer(spec, self.vocabulary)
+        self.scorers[scorer.name] = scorer
+        return scorer
+
+    def load(self, path: str) -> CompiledScorer:
+        with open(path) as f:
+            return self.register(json.load(f))
+
+    def load_dir(self, directory: str = SCORERS_DIR) -> 'ScorerRegistry':
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            self.load(path)
+        return self
+
+    def __getitem__(self, name: str) -> CompiledScorer:
+        return self.scorers[name]
+
+    def score_all(self, responses: Sequence[str],
+                  names: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Score responses with several scorer versions in a single pass over the text"""
+        names = list(names or self.scorers)
+        lowered = [r.lower() for r in responses]
+        needs_word_counts = any(self.scorers[name].needs_word_counts for name in names)
+        word_counts = _word_counts(responses) if needs_word_counts else None
+        columns = sorted(set().union(*(self.scorers[name].columns for name in names)))
+        presence = TermPresence(self.vocabulary, lowered, columns)
+        return {name: self.scorers[name].evaluate(lowered, presence, word_counts) for name in names}
+
+
+def default_registry() -> ScorerRegistry:
+    """Registry with every spec shipped in data/scorers"""
+    return ScorerRegistry().load_dir()
@@ -0,0 +1,164 @@
+"""Embedding-based scoring of recursion vs. sequence with a local encoder
+
+Keyword scorers can't tell real recursion from incidental words like
+"then" or "see". This scorer embeds responses with a local sentence
+encoder (transformers/torch, CPU) and compares them with prototype
+embeddings for recursive-with-progression and sequential answers.
+Vectors are cached on disk keyed by response hash, so re-scoring an
+archive only encodes responses it hasn't seen.
+"""
+import hashlib
+import sqlite3
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from src.core.geometric_tests import GeometricPrompt
+
+DEFAULT_ENCODER = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Hand-written exemplars; each prototype is the normalized mean of its embeddings
+DEFAULT_PROTOTYPES = {
+    'recursive': [
+        "Each time I return to this memory it has changed, because I remember remembering it before.",
+        "I see it now the way I saw it then, but seeing it again adds a deeper layer of understanding.",
+        "The pattern repeats, yet every cycle carries what the previous cycle taught me.",
+        "Thinking about how I used to think about it, I realize my understanding has evolved.",
+        "It loops back to the same place, but I am different, so the place is different too.",
+    ],
+    'sequential': [
+        "First this happened, then that happened, and finally the next step followed.",
+        "After Monday comes Tuesday, and after Tuesday comes Wednesday.",
+        "The process moves forward one step at a time until it is finished.",
+        "It starts at nine, continues until noon, and ends in the afternoon.",
+        "Step one leads to step two, which leads to step three.",
+    ],
+}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class SentenceEncoder:
+    """Mean-pooled, L2-normalized sentence embeddings from a HF encoder on CPU
+
+    Texts are sorted by length before batching so each batch pads to a
+    similar length, then returned in input order.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_ENCODER, batch_size: int = 64,
+                 max_length: int = 256, num_threads: Optional[int] = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        out = np.empty((len(texts), self.model.config.hidden_size), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                idx = order[start:start + self.batch_size]
+                batch = self.tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                                       max_length=self.max_length, return_tensors="pt")
+                hidden = self.model(**batch).last_hidden_state
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                out[idx] = torch.nn.functional.normalize(pooled, dim=-1).numpy()
+        return out
+
+
+class VectorCache:
+    """On-disk embedding cache keyed by (encoder, response hash)"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " encoder TEXT, hash TEXT, vector BLOB, PRIMARY KEY (encoder, hash))"
+        )
+
+    def get_many(self, encoder: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 900):
+            chunk = list(hashes[start:start + 900])
+            rows = self.conn.execute(
+                f"SELECT hash, vector FROM vectors WHERE encoder = ? AND hash IN ({','.join('?' * len(chunk))})",
+                [encoder] + chunk
+            )
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, encoder: str, hashes: Sequence[str], vectors: np.ndarray):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)",
+                [(encoder, h, np.ascontiguousarray(v, dtype=np.float32).tobytes())
+                 for h, v in zip(hashes, vectors)]
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def embed_cached(encoder: SentenceEncoder, cache: Optional[VectorCache],
+                 texts: Sequence[str]) -> np.ndarray:
+    """Embeddings for texts, encoding each unique uncached text once"""
+    hashes = [text_hash(t) for t in texts]
+    unique = dict(zip(hashes, texts))
+    vectors = cache.get_many(encoder.model_name, list(unique)) if cache else {}
+
+    missing = [h for h in unique if h not in vectors]
+    if missing:
+        encoded = encoder.encode([unique[h] for h in missing])
+        vectors.update(zip(missing, encoded))
+        if cache:
+            cache.put_many(encoder.model_name, missing, encoded)
+
+    return np.vstack([vectors[h] for h in hashes]) if hashes else np.empty((0, 0), dtype=np.float32)
+
+
+class SemanticScorer:
+    """Similarity of responses to recursive vs. sequential prototypes
+
+    Scores are cosine similarities to each prototype; 'total' is the
+    recursive-minus-sequential margin, so higher means more recursive.
+    """
+
+    def __init__(self, encoder: Optional[SentenceEncoder] = None,
+                 cache: Optional[VectorCache] = None,
+                 prototypes: Optional[Dict[str, List[str]]] = None):
+        self.encoder = encoder or SentenceEncoder()
+        self.cache = cache
+        self.prototype_names = list((prototypes or DEFAULT_PROTOTYPES).keys())
+        self.prototypes = np.vstack([
+            self._normalize(self.embed(examples).mean(axis=0))
+            for examples in (prototypes or DEFAULT_PROTOTYPES).values()
+        ])
+        self.components = [f"{name}_similarity" for name in self.prototype_names] + ['total']
+
+    @staticmethod
+    def _normalize(v: np.ndarray) -> np.ndarray:
+        return v / max(np.linalg.norm(v), 1e-12)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return embed_cached(self.encoder, self.cache, texts)
+
+    def score_batch(self, responses: Sequence[str]) -> np.ndarray:
+        """(n_responses x components) array; last column is the margin"""
+        if not len(responses):
+            return np.empty((0, len(self.components)))
+        similarities = self.embed(responses) @ self.prototypes.T
+        margin = similarities[:, 0] - similarities[:, 1]
+        return np.column_stack([similarities, margin])
+
+    def score_response(self, prompt: GeometricPrompt, response: str) -> Dict[str, float]:
+        return dict(zip(self.components, self.score_batch([response])[0].tolist()))
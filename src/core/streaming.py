@@ -0,0 +1,109 @@
+"""Incremental scoring of streamed responses with optional early stop"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.core.geometric_tests import GeometricTest, GeometricPrompt
+
+# Chunks containing one of these end a word, so they trigger a re-score
+BOUNDARY_CHARS = frozenset(' \t\n.,;:!?)"\'')
+
+
+class IncrementalScorer:
+    """Score a response as its tokens arrive
+
+    Wraps a test's score_response: the scores after final() are exactly
+    what score_response returns for the text received. Re-scoring is done
+    for chunks that contain a word boundary, including the leading space of
+    " word" style chunks. Scorers match substrings, so a marker completed
+    mid-word is picked up at the next boundary or by final().
+    """
+
+    def __init__(self, test: GeometricTest, prompt: GeometricPrompt,
+                 stop_on: Optional[Iterable[str]] = None):
+        self.test = test
+        self.prompt = prompt
+        # Components that must all hit their cap before we stop early
+        self.stop_on = list(stop_on) if stop_on is not None else list(test.COMPONENT_CAPS)
+        unknown = [c for c in self.stop_on if c not in test.COMPONENT_CAPS]
+        if unknown:
+            raise ValueError(f"No cap defined for components: {unknown}")
+        self.chunks: List[str] = []
+        self.scores: Dict[str, float] = {}
+        self._dirty = False
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.chunks)
+
+    def feed(self, chunk: str) -> Dict[str, float]:
+        """Consume one chunk, returning the current scores"""
+        self.chunks.append(chunk)
+        self._dirty = True
+        if not BOUNDARY_CHARS.isdisjoint(chunk):
+            self._rescore()
+        return self.scores
+
+    def _rescore(self):
+        self.scores = self.test.score_response(self.prompt, self.text)
+        self._dirty = False
+
+    @property
+    def saturated(self) -> bool:
+        """True once every stop_on component has reached its cap"""
+        if not self.stop_on:
+            return False
+        caps = self.test.COMPONENT_CAPS
+        return all(self.scores.get(c, 0.0) >= caps[c] - 1e-9 for c in self.stop_on)
+
+    def final(self) -> Dict[str, float]:
+        """Scores for the complete received text"""
+        if self._dirty or not self.scores:
+            self._rescore()
+        return self.scores
+
+
+def _early_stop_allowed(test: GeometricTest, early_stop: Optional[bool]) -> bool:
+    if early_stop and test.LENGTH_DEPENDENT:
+        raise ValueError(f"{type(test).__name__} scores {list(test.LENGTH_DEPENDENT)} by length; "
+                         "a truncated response would score differently")
+    return not test.LENGTH_DEPENDENT if early_stop is None else early_stop
+
+
+def stream_and_score(test: GeometricTest, prompt: GeometricPrompt, chunks: Iterator[str],
+                     stop_on: Optional[Iterable[str]] = None,
+                     early_stop: Optional[bool] = None) -> Dict:
+    """Consume a chunk stream, cancelling it once the stop_on components saturate
+
+    early_stop defaults to on, except for tests with LENGTH_DEPENDENT
+    components, which refuse it. A stopped response is recorded with
+    'truncated' set and is kept out of the test's pooled statistics.
+    Closing the generator cancels the underlying request, which saves the
+    remaining completion tokens.
+    """
+    early_stop = _early_stop_allowed(test, early_stop)
+    scorer = IncrementalScorer(test, prompt, stop_on)
+    stopped = False
+    try:
+        for chunk in chunks:
+            scorer.feed(chunk)
+            if early_stop and scorer.saturated:
+                stopped = True
+                break
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+    return test.record_response(prompt, scorer.text, scorer.final(), truncated=stopped)
+
+
+def run_streaming_test(test: GeometricTest, prompts: List[GeometricPrompt],
+                       stream_func: Callable[[str], Iterator[str]],
+                       stop_on: Optional[Iterable[str]] = None,
+                       early_stop: Optional[bool] = None) -> Dict:
+    """Streaming counterpart of GeometricTest.run_test"""
+    _early_stop_allowed(test, early_stop)
+    test_results = [
+        stream_and_score(test, prompt, stream_func(prompt.text), stop_on, early_stop)
+        for prompt in prompts
+    ]
+    return test.analyze_results(test_results)
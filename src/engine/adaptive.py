@@ -0,0 +1,121 @@
+"""AIMD concurrency control per provider, driven by latency and 429s
+
+The controller lets in-flight requests grow by about one per round trip
+while calls come back healthy, and halves the limit when a provider
+signals overload: a 429/rate-limit error, sustained latency degradation,
+or a burst of other errors. Latency is judged per window of healthy calls.
+Latency counts as degraded when `sustain` consecutive windows have a median
+above latency_tolerance times the baseline. The baseline is the lowest median among recent healthy windows.
+Medians ignore ordinary per-call variance, so a single slow call never
+triggers backoff. Taking the minimum over windows keeps queueing delay that
+builds up gradually from dragging the baseline upwards. Backoff happens at
+most once per spike-length interval, so one overloaded burst doesn't collapse
+the limit.
+"""
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an exception from any provider SDK is a 429 / quota error"""
+    for attr in ('status_code', 'code', 'status'):
+        if getattr(error, attr, None) == 429:
+            return True
+    text = f"{type(error).__name__} {error}".lower()
+    return '429' in text or 'ratelimit' in text or 'rate limit' in text or 'resourceexhausted' in text
+
+
+class AIMDController:
+    """Adjustable concurrency gate for one provider"""
+
+    def __init__(self, provider: str, initial: float = 2, minimum: int = 1, maximum: int = 16,
+                 increase: float = 1.0, backoff: float = 0.5, latency_tolerance: float = 2.0,
+                 error_threshold: float = 0.2, window: int = 20, baseline_windows: int = 50,
+                 sustain: int = 2, metrics=None):
+        self.provider = provider
+        self.limit = float(max(minimum, min(maximum, initial)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.window = window
+        self.sustain = sustain
+        self.slow_windows = 0  # consecutive windows above tolerance
+        self.metrics = metrics
+        self.in_flight = 0
+        self.latencies = []  # healthy latencies of the current window
+        self.window_medians = deque(maxlen=baseline_windows)  # medians of recent healthy windows
+        self.outcomes = deque(maxlen=window)  # True for calls that failed (not 429)
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._publish()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= max(self.minimum, int(self.limit)):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: Optional[float], ok: bool, throttled: bool = False):
+        """Report one finished call and adjust the limit"""
+        with self._cond:
+            self.in_flight -= 1
+            self.outcomes.append(not ok and not throttled)
+            degraded = ok and latency is not None and self._degraded(latency)
+            errors = (len(self.outcomes) == self.outcomes.maxlen
+                      and sum(self.outcomes) / len(self.outcomes) > self.error_threshold)
+
+            if throttled or degraded or errors:
+                self._decrease()
+            elif ok:
+                # About +increase per limit's worth of successes, i.e. per round trip
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+        self._publish()
+
+    def _degraded(self, latency: float) -> bool:
+        """Add a healthy latency; True when it completes the `sustain`-th slow window in a row"""
+        self.latencies.append(latency)
+        if len(self.latencies) < self.window:
+            return False
+        median = statistics.median(self.latencies)
+        self.latencies = []
+        baseline = self.baseline
+        if baseline is not None and median > self.latency_tolerance * baseline:
+            self.slow_windows += 1
+            if self.slow_windows >= self.sustain:
+                self.slow_windows = 0
+                return True
+            return False
+        self.slow_windows = 0
+        self.window_medians.append(median)
+        return False
+
+    @property
+    def baseline(self) -> Optional[float]:
+        return min(self.window_medians) if self.window_medians else None
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline or 0.0) * self.latency_tolerance:
+            return
+        self.limit = max(float(self.minimum), self.limit * self.backoff)
+        self._last_decrease = now
+        self.decreases += 1
+        self.outcomes.clear()
+
+    def _publish(self):
+        if not self.metrics:
+            return
+        self.metrics.set_gauge("concurrency_limit", self.limit, provider=self.provider)
+        self.metrics.set_gauge("concurrency_in_flight", self.in_flight, provider=self.provider)
+        self.metrics.set_gauge("concurrency_decreases", self.decreases, provider=self.provider)
+        baseline = self.baseline
+        if baseline is not None:
+            self.metrics.set_gauge("latency_baseline_seconds", baseline, provider=self.provider)
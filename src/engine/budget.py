@@ -0,0 +1,198 @@
+"""Spend-capped, priority-ordered scheduling of matched-pair jobs
+
+SpendBudget caps spend per model and overall using live token usage from
+Instrumentation. Jobs still in flight are covered by reserved estimates,
+priced from the prompts' real token lengths (TokenLengthIndex).
+BudgetScheduler dispatches jobs in units: the jobs of one model at one
+prompt position and sample, across all conditions (a linear/spiral pair).
+Each unit's cost is reserved up front, so a budget stop skips whole pairs
+and never leaves one member unanswered. The members of a unit are sent
+concurrently, so a pair costs one round trip. Units are taken from a priority
+queue per provider. Work submitted at a higher priority, even from
+another thread while a run is going, is dispatched before any queued
+lower-priority unit. Calls already in flight are not interrupted.
+"""
+import heapq
+import itertools
+import threading
+from collections import defaultdict
+from concurrent.futures import Future, wait
+from typing import Callable, Dict, List, Optional
+
+from src.core.paired_test import pair_id
+from src.engine.scheduler import Job, MultiModelScheduler, ProviderLimits, RateLimiter
+from src.models.multi_model_manager import MODEL_IDS
+from src.models.token_counts import TokenLengthIndex
+
+BUDGET_EXHAUSTED = "Skipped: budget exhausted"
+
+
+class SpendBudget:
+    """Per-model and global USD caps checked against live spend plus reservations"""
+
+    def __init__(self, instrumentation, caps: Optional[Dict[str, float]] = None,
+                 total: Optional[float] = None, completion_tokens: int = 150, metrics=None,
+                 tokens: Optional[TokenLengthIndex] = None):
+        self.instrumentation = instrumentation
+        self.caps = dict(caps or {})
+        self.total = total
+        self.completion_tokens = completion_tokens  # max_tokens, for the estimate before any usage
+        self.metrics = metrics
+        self.tokens = tokens or TokenLengthIndex()
+        self.reserved: Dict[str, float] = defaultdict(float)
+        self.skipped: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def estimate(self, job: Job) -> float:
+        """Expected cost of one call: the model's live average, else a full-completion estimate"""
+        live = self.instrumentation.mean_cost(job.model)
+        if live is not None:
+            return live
+        prompt_tokens = self.tokens.length(job.model, job.prompt.text)
+        return self.instrumentation.cost_for(MODEL_IDS.get(job.model, job.model),
+                                             prompt_tokens, self.completion_tokens)
+
+    def remaining(self, model: Optional[str] = None) -> Optional[float]:
+        """Unreserved headroom under a model's cap (or the global cap); None if uncapped"""
+        cap = self.total if model is None else self.caps.get(model)
+        if cap is None:
+            return None
+        reserved = sum(self.reserved.values()) if model is None else self.reserved[model]
+        return cap - self.instrumentation.total_cost(model) - reserved
+
+    def reserve(self, jobs: List[Job]) -> Optional[Dict[str, float]]:
+        """Reserve the estimated cost of jobs as a unit; None if any cap would be exceeded"""
+        need: Dict[str, float] = defaultdict(float)
+        for job in jobs:
+            need[job.model] += self.estimate(job)
+        with self._lock:
+            fits = all(self.remaining(m) is None or self.remaining(m) >= cost for m, cost in need.items())
+            if fits and self.total is not None:
+                fits = self.remaining() >= sum(need.values())
+            if fits:
+                for model, cost in need.items():
+                    self.reserved[model] += cost
+            else:
+                for job in jobs:
+                    self.skipped[job.model] += 1
+        self._publish(need)
+        return dict(need) if fits else None
+
+    def release(self, reservation: Dict[str, float]):
+        """Drop a reservation once its calls have recorded their real cost"""
+        with self._lock:
+            for model, cost in reservation.items():
+                self.reserved[model] -= cost
+        self._publish(reservation)
+
+    def _publish(self, models):
+        if not self.metrics:
+            return
+        for model in models:
+            self.metrics.set_gauge("budget_spent_usd", self.instrumentation.total_cost(model), model=model)
+            self.metrics.set_gauge("budget_skipped_jobs", self.skipped[model], model=model)
+            remaining = self.remaining(model)
+            if remaining is not None:
+                self.metrics.set_gauge("budget_remaining_usd", remaining, model=model)
+        if self.total is not None:
+            self.metrics.set_gauge("budget_remaining_usd", self.remaining(), model="total")
+
+
+class BudgetScheduler(MultiModelScheduler):
+    """MultiModelScheduler that dispatches pair units by priority under a SpendBudget"""
+
+    def __init__(self, model_funcs: Dict[str, Callable[[str], str]], budget: SpendBudget,
+                 limits: Optional[Dict[str, ProviderLimits]] = None,
+                 providers: Optional[Dict[str, str]] = None,
+                 metrics=None):
+        super().__init__(model_funcs, limits=limits, providers=providers, metrics=metrics)
+        self.budget = budget
+        self._queues: Dict[str, list] = defaultdict(list)  # provider -> heap of (-priority, seq, unit, future)
+        self._workers: Dict[str, int] = defaultdict(int)
+        self._unit_size: Dict[str, int] = defaultdict(lambda: 1)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def pair_units(jobs: List[Job]) -> List[List[Job]]:
+        """Group jobs by model and position within their (model, condition) lane
+
+        Position i pairs up across conditions the same way successful_responses
+        pairs them, so each unit is one matched pair (or a lone job when a
+        model has a single condition). Members of two-job units get a shared
+        pair_id.
+        """
+        lanes: Dict = defaultdict(int)
+        units: Dict = {}
+        for job in jobs:
+            position = lanes[(job.model, job.condition)]
+            lanes[(job.model, job.condition)] += 1
+            units.setdefault((job.model, position), []).append(job)
+        for unit in units.values():
+            if len(unit) == 2:
+                unit[0].pair_id = unit[1].pair_id = pair_id(unit[0].prompt, unit[1].prompt, unit[0].sample)
+        return list(units.values())
+
+    def submit(self, jobs: List[Job], priority: int = 0) -> List[Future]:
+        """Queue jobs as pair units; each future resolves to its unit when finished"""
+        futures = []
+        with self._cond:
+            for unit in self.pair_units(jobs):
+                future = Future()
+                provider = self.provider_for(unit[0].model)
+                heapq.heappush(self._queues[provider], (-priority, next(self._seq), unit, future))
+                self._unit_size[provider] = max(self._unit_size[provider], len(unit))
+                futures.append(future)
+            for provider, queue in self._queues.items():
+                # Each worker has a whole unit in flight
+                ceiling = max(1, self.limits_for(provider).max_concurrency // self._unit_size[provider])
+                while self._workers[provider] < min(ceiling, len(queue)):
+                    self._workers[provider] += 1
+                    threading.Thread(target=self._work, args=(provider,), daemon=True,
+                                     name=f"budget-{provider}").start()
+        return futures
+
+    def run(self, jobs: List[Job], expect: bool = True, priority: int = 0) -> List[Job]:
+        """Execute jobs at `priority`, returning them in their original order
+
+        Jobs of pairs the budget can't cover get error BUDGET_EXHAUSTED and
+        are never sent.
+        """
+        if self.metrics and expect:
+            self.metrics.expect(jobs)
+        wait(self.submit(jobs, priority))
+        return jobs
+
+    def _work(self, provider: str):
+        with self._cond:
+            limiter = self._limiters.setdefault(
+                provider, RateLimiter(self.limits_for(provider).requests_per_minute))
+            controller = self.controller_for(provider)
+        while True:
+            with self._cond:
+                if not self._queues[provider]:
+                    self._workers[provider] -= 1
+                    return
+                _, _, unit, future = heapq.heappop(self._queues[provider])
+            try:
+                reservation = self.budget.reserve(unit)
+                if reservation is None:
+                    for job in unit:
+                        job.error = BUDGET_EXHAUSTED
+                        if self.metrics:
+                            # Counted as failed so progress totals still close
+                            self.metrics.request_started(job.model)
+                            self.metrics.request_finished(job.model, job.condition, None, ok=False)
+                else:
+                    try:
+                        helpers = [threading.Thread(target=self._execute, args=(job, limiter, controller))
+                                   for job in unit[1:]]
+                        for helper in helpers:
+                            helper.start()
+                        self._execute(unit[0], limiter, controller)
+                        for helper in helpers:
+                            helper.join()
+                    finally:
+                        self.budget.release(reservation)
+            finally:
+                future.set_result(unit)
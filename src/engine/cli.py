@@ -0,0 +1,81 @@
+"""Command-line runner for experiment files
+
+    python -m src.engine.cli plan experiments/configs/final_matched.yaml
+    python -m src.engine.cli run experiments/configs/final_matched.yaml [--max-cost 5]
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from src.engine.experiment import Experiment, ResponseCache, compile_plan, run_plan
+from src.engine.metrics import MetricsServer, ProgressBars, RunMetrics
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.engine.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    plan_parser = commands.add_parser("plan", help="print the execution plan and cost estimate")
+    plan_parser.add_argument("experiment")
+    run_parser = commands.add_parser("run", help="print the plan, then execute it")
+    run_parser.add_argument("experiment")
+    run_parser.add_argument("--max-cost", type=float, default=None,
+                            help="abort if the estimated cost (USD) exceeds this")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    experiment = Experiment.load(args.experiment)
+    cache = ResponseCache(experiment.cache) if experiment.cache else None
+    plan = compile_plan(experiment, cache)
+    print(plan.describe())
+    if args.command == "plan":
+        return 0
+
+    estimate = sum(plan.estimated_cost.values())
+    if args.max_cost is not None and estimate > args.max_cost:
+        print(f"Estimated cost ${estimate:.4f} exceeds --max-cost ${args.max_cost:.4f}; not running")
+        return 1
+
+    from src.models.multi_model_manager import MultiModelManager
+    manager = MultiModelManager(models=experiment.models)
+    missing = [m for m in experiment.models if m not in manager.models]
+    if missing and any(j.model in missing for j in plan.pending):
+        print(f"Models not configured (missing API keys?): {', '.join(missing)}")
+        return 1
+
+    metrics = RunMetrics(instrumentation=[manager.instrumentation])
+    metrics.expect(plan.pending)
+    server = MetricsServer(metrics, port=experiment.metrics_port).start() if experiment.metrics_port else None
+    bars = ProgressBars(metrics)
+    try:
+        results = run_plan(plan, manager.models, metrics=metrics, cache=cache,
+                           instrumentation=manager.instrumentation)
+    finally:
+        bars.close()
+        if server:
+            server.stop()
+
+    # Both analyses need exactly two conditions: paired diff is first - second,
+    # the mixed effect is second - first (the second is the treatment)
+    conditions = list(experiment.conditions)
+    for model, summary in results['models'].items():
+        paired = summary.get('paired')
+        line = f"{model:<10} errors={summary['n_errors']}"
+        if summary['n_skipped']:
+            line += f" skipped={summary['n_skipped']}"
+        if paired:
+            line += (f"  n={paired['n_pairs']} diff({conditions[0]}-{conditions[1]})={paired['difference']:.3f} "
+                     f"t={paired['t_statistic']:.3f} d={paired['cohens_d']:.3f}")
+        print(line)
+    for model, effect in results.get('mixed_effects', {}).get('effects', {}).items():
+        p_text = "n/a" if effect['p_value'] is None else f"{effect['p_value']:.4f}"
+        print(f"{model:<10} mixed effect({conditions[1]}-{conditions[0]})={effect['effect']:.3f} SE={effect['se']:.3f} p={p_text}")
+    print(f"Total cost: ${manager.instrumentation.total_cost():.4f}")
+    for sink, path in results['outputs'].items():
+        print(f"{sink}: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Recursion-depth sweeps across models, scored with the spiral components"""
+from collections import defaultdict
+from typing import Callable, Dict, Optional
+
+from src.analysis.degradation import fit_degradation
+from src.engine.scheduler import MultiModelScheduler, ProviderLimits
+from src.tests.recursive_depth import RecursiveDepthTest
+
+
+class DepthSweep:
+    """Generate depth x template prompts, run them concurrently and fit curves
+
+    All models and depths go through one MultiModelScheduler run, so the
+    sweep takes about as long as the slowest provider's share of the jobs.
+    """
+
+    def __init__(self, model_funcs: Dict[str, Callable[[str], str]], max_depth: int = 20,
+                 n_templates: int = 50, samples: int = 1,
+                 limits: Optional[Dict[str, ProviderLimits]] = None, metrics=None):
+        self.model_funcs = model_funcs
+        self.max_depth = max_depth
+        self.n_templates = n_templates
+        self.samples = samples
+        self.scheduler = MultiModelScheduler(model_funcs, limits=limits, metrics=metrics)
+        self.prompts = RecursiveDepthTest().generate_depth_prompts(max_depth, n_templates)
+        self.tests: Dict[str, RecursiveDepthTest] = {}
+
+    @staticmethod
+    def condition(depth: int) -> str:
+        return f"depth_{depth}"
+
+    def run(self, n_boot: int = 1000, ci: float = 0.95) -> Dict[str, Dict]:
+        """Run the sweep; returns per-model curves and component means by depth"""
+        models = list(self.model_funcs)
+        conditions = {self.condition(d): prompts for d, prompts in self.prompts.items()}
+        jobs = self.scheduler.run(self.scheduler.build_jobs(models, conditions, self.samples))
+
+        results = {}
+        for model in models:
+            test = self.tests[model] = RecursiveDepthTest(model_name=model, max_depth=self.max_depth)
+            totals = defaultdict(list)
+            components = defaultdict(lambda: defaultdict(list))
+            errors = 0
+            for job in jobs:
+                if job.model != model:
+                    continue
+                if job.error is not None:
+                    errors += 1
+                    continue
+                depth = int(job.condition.split('_')[1])
+                scores = test.record_response(job.prompt, job.response)['scores']
+                totals[depth].append(scores['total'])
+                for component in test.COMPONENT_CAPS:
+                    components[depth][component].append(scores[component])
+
+            if not totals:
+                results[model] = {'error': 'No valid responses', 'n_errors': errors}
+                continue
+
+            curve = fit_degradation(totals, n_boot=n_boot, ci=ci)
+            curve['components'] = {
+                c: [sum(components[d][c]) / len(components[d][c]) for d in curve['depths']]
+                for c in test.COMPONENT_CAPS
+            }
+            curve['n_errors'] = errors
+            results[model] = curve
+        return results
@@ -0,0 +1,125 @@
+"""Coordinator/worker execution over a shared WorkQueue
+
+The coordinator submits the model x condition x prompt x sample job
+matrix and consumes results as workers finish them. Each worker leases
+small batches, runs them through its own MultiModelScheduler (so provider
+limits apply per worker), and commits results one batch at a time. A worker
+that dies simply lets its leases expire, and the jobs go to another worker.
+
+Workers on other hosts point at the same queue file; SQLite needs a
+filesystem with working locks for that (not most NFS mounts).
+
+    python -m src.engine.distributed worker --queue data/queue.db --models gpt-3.5 haiku
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from src.engine.scheduler import Job, MultiModelScheduler, ProviderLimits
+from src.engine.work_queue import WorkQueue
+
+
+class QueueWorker:
+    """Lease jobs, generate responses and commit them until the queue drains"""
+
+    def __init__(self, queue_path: str, model_funcs: Dict[str, Callable[[str], str]],
+                 worker_id: Optional[str] = None, batch_size: int = 8,
+                 lease_seconds: float = 300.0, poll_interval: float = 1.0,
+                 limits: Optional[Dict[str, ProviderLimits]] = None, run: Optional[str] = None,
+                 metrics=None):
+        self.queue = WorkQueue(queue_path)
+        self.model_funcs = model_funcs
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.run_name = run
+        self.scheduler = MultiModelScheduler(model_funcs, limits=limits, metrics=metrics)
+        self.completed = 0
+        self.lost = 0  # results dropped because the lease had expired
+
+    def run(self, drain: bool = True) -> int:
+        """Work until no job is pending or in flight (or forever if not `drain`)"""
+        models = list(self.model_funcs)
+        while True:
+            leased = self.queue.lease(self.worker_id, self.batch_size, self.lease_seconds,
+                                      models=models, run=self.run_name)
+            if not leased:
+                if drain and not self.queue.outstanding(self.run_name):
+                    return self.completed
+                time.sleep(self.poll_interval)
+                continue
+            # Progress totals are registered by whoever planned the jobs
+            self.scheduler.run([job for _, job in leased], expect=False)
+            stored = self.queue.complete(leased, self.worker_id)
+            self.completed += sum(stored)
+            self.lost += len(stored) - sum(stored)
+
+
+class Coordinator:
+    """Submit a job matrix and stream its results back as workers finish"""
+
+    def __init__(self, queue_path: str, run: str = 'default'):
+        self.queue = WorkQueue(queue_path)
+        self.run_name = run
+
+    def submit(self, jobs: List[Job]) -> int:
+        return self.queue.submit(jobs, self.run_name)
+
+    def results(self, poll_interval: float = 1.0, timeout: Optional[float] = None) -> Iterator[Job]:
+        """Yield finished jobs in completion order until none are outstanding"""
+        seq = 0
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            finished = self.queue.finished_since(self.run_name, seq)
+            for seq, _, job in finished:
+                yield job
+            if not finished and not self.queue.outstanding(self.run_name):
+                return
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"{self.queue.outstanding(self.run_name)} jobs still outstanding")
+            if not finished:
+                time.sleep(poll_interval)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.engine.distributed", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker_parser = commands.add_parser("worker", help="lease and run jobs from a queue")
+    worker_parser.add_argument("--queue", required=True)
+    worker_parser.add_argument("--models", nargs="+", default=None)
+    worker_parser.add_argument("--run", default=None, help="only take jobs from this run")
+    worker_parser.add_argument("--batch", type=int, default=8)
+    worker_parser.add_argument("--lease", type=float, default=300.0, help="lease length in seconds")
+    worker_parser.add_argument("--forever", action="store_true", help="keep polling after the queue drains")
+    status_parser = commands.add_parser("status", help="print job counts")
+    status_parser.add_argument("--queue", required=True)
+    status_parser.add_argument("--run", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(WorkQueue(args.queue).counts(args.run))
+        return 0
+
+    from dotenv import load_dotenv
+    from src.models.multi_model_manager import MultiModelManager
+    load_dotenv()
+    manager = MultiModelManager(models=args.models)
+    models = manager.models
+    if not models:
+        print("No requested models are configured (missing API keys?)")
+        return 1
+    worker = QueueWorker(args.queue, models, batch_size=args.batch, lease_seconds=args.lease, run=args.run)
+    print(f"Worker {worker.worker_id} serving {', '.join(models)}")
+    completed = worker.run(drain=not args.forever)
+    print(f"Completed {completed} jobs ({worker.lost} late results dropped), "
+          f"cost ${manager.instrumentation.total_cost():.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
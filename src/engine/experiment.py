@@ -0,0 +1,375 @@
+"""Declarative experiment definitions compiled into scheduler runs
+
+An experiment file (YAML or JSON) names the prompts, models, samples,
+provider limits, response cache, durable job table, response store and
+output sinks. See
+experiments/configs/final_matched.yaml:
+
+    name: final_matched
+    prompts: data/prompts/matched_20_pairs.json   # {condition: [prompt, ...]}
+    conditions:
+      linear: {test: control_linear}
+      spiral: {test: spiral_temporal}              # or {test: ..., generate: 20}
+    models: [gpt-3.5, haiku, gemini]
+    samples: 1
+    limits:
+      anthropic: {max_concurrency: 4, requests_per_minute: 50}
+    cache: data/cache/responses.jsonl
+    queue: data/queue/{name}.db                      # durable job table; resumable
+    store: data/store/responses.db                   # dedupes texts, memoizes scores
+    budget: {total: 5.00, gpt-4: 2.00}               # USD caps from live usage; skips whole pairs
+    approximate_cache: {threshold: 0.95}             # reuse near-duplicate prompts' responses (sweeps only)
+    analysis: [paired, mixed_effects]
+    sinks:
+      results: data/results/{name}_{timestamp}.json
+      calls: data/results/{name}_{timestamp}_calls.json
+
+compile_plan() expands this into scheduler jobs and estimates calls and
+cost before anything is sent; run_plan() executes the plan on the
+MultiModelScheduler (the BudgetScheduler with a budget; or, with a queue, through the durable job table so an
+interrupted run resumes where it stopped), scores the successful responses
+and writes the sinks.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import yaml
+
+from src.analysis.mixed_effects import fit_mixed_effects, observations_from_pairs
+from src.core.archive import write_archive
+from src.core.geometric_tests import GeometricPrompt
+from src.core.response_store import ResponseStore
+from src.core.online_stats import PairedRunningStats
+from src.engine.budget import BUDGET_EXHAUSTED, BudgetScheduler, SpendBudget
+from src.engine.distributed import QueueWorker
+from src.engine.prompt_cache import EXACT, ApproximateCache
+from src.engine.scheduler import Job, MultiModelScheduler, ProviderLimits
+from src.engine.work_queue import DONE, WorkQueue
+from src.models.instrumentation import PRICING
+from src.models.multi_model_manager import MODEL_IDS
+from src.models.token_counts import TokenLengthIndex
+from src.tests.control_linear import LinearTemporalTest
+from src.tests.recursive_depth import RecursiveDepthTest
+from src.tests.spiral_temporal import SpiralTemporalTest
+
+TESTS = {
+    'control_linear': LinearTemporalTest,
+    'spiral_temporal': SpiralTemporalTest,
+    'recursive_depth': RecursiveDepthTest,
+}
+
+SINKS = ('results', 'responses', 'archive', 'calls')
+
+
+@dataclass
+class Experiment:
+    """One experiment file, validated"""
+    name: str
+    conditions: Dict[str, Dict]
+    models: List[str]
+    prompts: Optional[str] = None
+    samples: int = 1
+    limits: Dict[str, ProviderLimits] = field(default_factory=dict)
+    cache: Optional[str] = None
+    queue: Optional[str] = None  # path template for the durable job table
+    store: Optional[str] = None  # content-addressed responses and score memo
+    budget: Dict[str, float] = field(default_factory=dict)  # USD per model, plus 'total'
+    approximate_cache: Optional[Dict] = None  # {threshold, encoder, vectors}; exploratory runs only
+    analysis: List[str] = field(default_factory=lambda: ['paired'])
+    sinks: Dict[str, str] = field(default_factory=dict)
+    completion_tokens: int = 150  # max_tokens used by the model managers
+    metrics_port: Optional[int] = None
+
+    @classmethod
+    def load(cls, path: str) -> 'Experiment':
+        with open(path) as f:
+            spec = yaml.safe_load(f)
+        return cls.from_dict(spec)
+
+    @classmethod
+    def from_dict(cls, spec: Dict) -> 'Experiment':
+        spec = dict(spec)
+        spec['limits'] = {p: ProviderLimits(**l) for p, l in spec.get('limits', {}).items()}
+        spec['conditions'] = {c: ({'test': v} if isinstance(v, str) else v)
+                              for c, v in spec['conditions'].items()}
+        if spec.get('queue'):
+            spec['queue'] = spec['queue'].format(name=spec['name'])
+        experiment = cls(**spec)
+        for condition, c in experiment.conditions.items():
+            if c.get('test') not in TESTS:
+                raise ValueError(f"Condition {condition}: unknown test {c.get('test')!r}, "
+                                 f"expected one of {sorted(TESTS)}")
+            if 'generate' not in c and not experiment.prompts:
+                raise ValueError(f"Condition {condition} needs a prompts file or 'generate'")
+        if experiment.approximate_cache is not None:
+            unknown = set(experiment.approximate_cache) - {'threshold', 'encoder', 'vectors'}
+            if unknown or not experiment.cache:
+                raise ValueError("approximate_cache needs 'cache' and takes only threshold, encoder, vectors")
+        if experiment.budget and experiment.queue:
+            raise ValueError("budget needs whole pairs dispatched together; drop 'queue' to use it")
+        unknown = set(experiment.sinks) - set(SINKS)
+        if unknown:
+            raise ValueError(f"Unknown sinks {sorted(unknown)}, expected {SINKS}")
+        return experiment
+
+    def load_prompts(self) -> Dict[str, List[GeometricPrompt]]:
+        data = {}
+        if self.prompts:
+            with open(self.prompts) as f:
+                data = json.load(f)
+        prompts = {}
+        for condition, c in self.conditions.items():
+            if 'generate' in c:
+                prompts[condition] = TESTS[c['test']]().generate_prompts(c['generate'])
+            else:
+                prompts[condition] = [GeometricPrompt(**p) for p in data[condition]]
+        return prompts
+
+
+class ResponseCache:
+    """Append-only JSONL of successful responses keyed by model, prompt text and sample"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, str] = {}
+        self.records: List[Dict] = []  # entries that also recorded their prompt, for ApproximateCache
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry['key']] = entry['response']
+                    if 'prompt' in entry:
+                        self.records.append(entry)
+
+    @staticmethod
+    def key(job: Job) -> str:
+        return hashlib.sha256(f"{job.model}\n{job.sample}\n{job.prompt.text}".encode('utf-8')).hexdigest()
+
+    def get(self, job: Job) -> Optional[str]:
+        return self.entries.get(self.key(job))
+
+    def put_all(self, jobs: List[Job]):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            for job in jobs:
+                if job.error is None and job.response is not None:
+                    key = self.key(job)
+                    self.entries[key] = job.response
+                    record = {'key': key, 'model': job.model, 'sample': job.sample,
+                              'prompt': job.prompt.text, 'response': job.response}
+                    self.records.append(record)
+                    f.write(json.dumps(record) + "\n")
+
+
+@dataclass
+class Plan:
+    """Jobs for one experiment, split into cached and to-be-called"""
+    experiment: Experiment
+    prompts: Dict[str, List[GeometricPrompt]]
+    jobs: List[Job]
+    pending: List[Job]
+    estimated_cost: Dict[str, float]
+    tokens: Optional[TokenLengthIndex] = None  # prompt token lengths, shared with the budget
+
+    def describe(self) -> str:
+        e = self.experiment
+        lines = [f"Experiment: {e.name}"]
+        for condition, prompts in self.prompts.items():
+            lines.append(f"  {condition}: {len(prompts)} prompts ({e.conditions[condition]['test']})")
+        lines.append(f"  models: {', '.join(e.models)} x {e.samples} sample(s)")
+        lines.append(f"  jobs: {len(self.jobs)}, cached: {len(self.jobs) - len(self.pending)}, "
+                     f"calls: {len(self.pending)}")
+        approximate = sum(1 for j in self.jobs if j.cache_hit and j.cache_hit['tier'] != EXACT)
+        if approximate:
+            lines.append(f"  approximate cache hits: {approximate} (flagged in results; not full fidelity)")
+        for model, cost in self.estimated_cost.items():
+            calls = sum(1 for j in self.pending if j.model == model)
+            lines.append(f"    {model:<10} {calls:>6} calls  ~${cost:.4f}")
+        lines.append(f"  estimated cost: ~${sum(self.estimated_cost.values()):.4f}")
+        return "\n".join(lines)
+
+
+def estimate_cost(jobs: List[Job], completion_tokens: int,
+                  tokens: Optional[TokenLengthIndex] = None) -> Dict[str, float]:
+    """Upper-bound cost assuming every call uses its full completion budget"""
+    tokens = tokens or TokenLengthIndex()
+    by_model: Dict[str, List[str]] = {}
+    for job in jobs:
+        by_model.setdefault(job.model, []).append(job.prompt.text)
+    costs = {}
+    for model, texts in by_model.items():
+        prompt_rate, completion_rate = PRICING.get(MODEL_IDS.get(model, model), (0.0, 0.0))
+        prompt_tokens = int(tokens.lengths(model, texts).sum())
+        costs[model] = (prompt_tokens * prompt_rate + len(texts) * completion_tokens * completion_rate) / 1000
+    return costs
+
+
+def compile_plan(experiment: Experiment, cache: Optional[ResponseCache] = None) -> Plan:
+    prompts = experiment.load_prompts()
+    jobs = MultiModelScheduler.build_jobs(experiment.models, prompts, experiment.samples)
+    finished = {}
+    if experiment.queue and os.path.exists(experiment.queue):
+        queue = WorkQueue(experiment.queue)
+        keys = WorkQueue.keys_for(jobs)
+        rows = queue.lookup(keys)
+        queue.close()
+        finished = {id(job): rows[key][1].response for key, job in zip(keys, jobs)
+                    if key in rows and rows[key][0] == DONE}
+    pending = []
+    for job in jobs:
+        cached = finished.get(id(job))
+        if cached is None and cache:
+            cached = cache.get(job)
+            if cached is not None:
+                job.cache_hit = {'tier': EXACT}
+        if cached is None:
+            pending.append(job)
+        else:
+            job.response = cached
+    if experiment.approximate_cache is not None and cache and pending:
+        ApproximateCache(cache, **experiment.approximate_cache).lookup(pending)
+        pending = [job for job in pending if job.response is None]
+    tokens = TokenLengthIndex.for_prompts(experiment.prompts)
+    return Plan(experiment, prompts, jobs, pending,
+                estimate_cost(pending, experiment.completion_tokens, tokens), tokens)
+
+
+def _complete_positions(scores: Dict, model: str, conditions: List[str]) -> set:
+    """(prompt position, sample) keys scored in every condition for a model"""
+    keys = None
+    for condition in conditions:
+        scored = {(i, s) for (m, c, i, s) in scores if m == model and c == condition}
+        keys = scored if keys is None else keys & scored
+    return keys or set()
+
+
+def _run_durable(plan: Plan, model_funcs: Dict[str, Callable[[str], str]], metrics=None):
+    """Drain the plan through the experiment's job table and copy outcomes back"""
+    e = plan.experiment
+    os.makedirs(os.path.dirname(e.queue) or '.', exist_ok=True)
+    queue = WorkQueue(e.queue)
+    # This process is the run's only worker: leases left by an interrupted run
+    # are stale, and previously failed jobs get a fresh attempt budget
+    queue.release_in_flight(e.name)
+    queue.retry_failed(e.name)
+    # Only jobs still needing a call; keys come from the full matrix so they stay stable
+    keys = WorkQueue.keys_for(plan.jobs)
+    pending = {id(job) for job in plan.pending}
+    queue.submit([job for job in plan.jobs if id(job) in pending], e.name,
+                 keys=[key for key, job in zip(keys, plan.jobs) if id(job) in pending])
+    QueueWorker(e.queue, model_funcs, limits=e.limits, run=e.name, metrics=metrics,
+                poll_interval=0.1).run()
+
+    rows = queue.lookup(keys)
+    queue.close()
+    for key, job in zip(keys, plan.jobs):
+        if id(job) in pending:
+            stored = rows[key][1]
+            job.response, job.error, job.latency = stored.response, stored.error, stored.latency
+
+
+def run_plan(plan: Plan, model_funcs: Dict[str, Callable[[str], str]], metrics=None,
+             cache: Optional[ResponseCache] = None, instrumentation=None) -> Dict:
+    """Execute pending jobs, score every response and write the configured sinks"""
+    e = plan.experiment
+    if metrics:
+        metrics.record_cache(True, len(plan.jobs) - len(plan.pending))
+        metrics.record_cache(False, len(plan.pending))
+
+    if e.queue:
+        _run_durable(plan, model_funcs, metrics)
+    elif e.budget:
+        if instrumentation is None:
+            raise ValueError("A budget needs the models' instrumentation for live spend")
+        caps = {m: cap for m, cap in e.budget.items() if m != 'total'}
+        budget = SpendBudget(instrumentation, caps, e.budget.get('total'),
+                             completion_tokens=e.completion_tokens, metrics=metrics, tokens=plan.tokens)
+        BudgetScheduler(model_funcs, budget, limits=e.limits, metrics=metrics).run(plan.pending)
+    else:
+        MultiModelScheduler(model_funcs, limits=e.limits, metrics=metrics).run(plan.pending)
+    if cache:
+        cache.put_all(plan.pending)
+
+    # Failed calls are counted, never scored
+    positions = {c: {id(p): i for i, p in enumerate(prompts)} for c, prompts in plan.prompts.items()}
+    groups: Dict = {}
+    errors = {m: 0 for m in e.models}
+    skipped = {m: 0 for m in e.models}
+    for job in plan.jobs:
+        if job.error == BUDGET_EXHAUSTED:
+            skipped[job.model] += 1
+        elif job.error is not None:
+            errors[job.model] += 1
+        else:
+            groups.setdefault((job.model, job.condition), []).append(job)
+
+    # With a store, each unique text is scored once per scorer version
+    if e.store:
+        os.makedirs(os.path.dirname(e.store) or '.', exist_ok=True)
+    store = ResponseStore(e.store, metrics=metrics) if e.store else None
+    tests: Dict = {}
+    scores: Dict = {}  # (model, condition, prompt position, sample) -> total
+    for (model, condition), group in groups.items():
+        test = tests[(model, condition)] = TESTS[e.conditions[condition]['test']](model_name=model)
+        responses = [j.response for j in group]
+        memo = store.score_test(test, responses) if store is not None else [None] * len(group)
+        for job, memo_scores in zip(group, memo):
+            result = test.record_response(job.prompt, job.response, memo_scores)
+            if job.cache_hit:
+                result['cache_hit'] = job.cache_hit
+            scores[(model, condition, positions[condition][id(job.prompt)], job.sample)] = result['scores']['total']
+
+    results = {'experiment': e.name, 'models': {}}
+    conditions = list(e.conditions)
+    for model in e.models:
+        summary = {c: tests[(model, c)].analyze_results(tests[(model, c)].results)
+                   for c in conditions if (model, c) in tests}
+        summary['n_errors'] = errors[model]
+        summary['n_skipped'] = skipped[model]
+        summary['n_approximate'] = sum(1 for j in plan.jobs if j.model == model and j.cache_hit
+                                       and j.cache_hit['tier'] != EXACT)
+        if 'paired' in e.analysis and len(conditions) == 2:
+            paired = PairedRunningStats()
+            for i, sample in sorted(_complete_positions(scores, model, conditions)):
+                paired.update(scores[(model, conditions[0], i, sample)],
+                              scores[(model, conditions[1], i, sample)])
+            summary['paired'] = paired.summary()
+        results['models'][model] = summary
+
+    if 'mixed_effects' in e.analysis and len(conditions) == 2:
+        # Pair i is prompt position i; keep positions every model answered in both conditions
+        complete = set.intersection(*(_complete_positions(scores, m, conditions) for m in e.models))
+        if complete:
+            by_model = {m: {c: [scores[(m, c, i, s)] for i, s in sorted(complete)] for c in conditions}
+                        for m in e.models}
+            results['mixed_effects'] = fit_mixed_effects(
+                observations_from_pairs(by_model, tuple(conditions)), treatment=conditions[1])
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    paths = {sink: template.format(name=e.name, timestamp=timestamp) for sink, template in e.sinks.items()}
+    for path in paths.values():
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if 'results' in paths:
+        with open(paths['results'], 'w') as f:
+            json.dump(results, f, indent=2)
+    rows = [dict(r, condition=condition) for (_, condition), test in tests.items() for r in test.results]
+    if 'responses' in paths:
+        if store is not None:
+            # Texts live in the store; rows reference them by hash
+            hashes = store.put_many([r['response'] for r in rows])
+            stored_rows = [{k: v for k, v in dict(r, response_hash=h).items() if k != 'response'}
+                           for r, h in zip(rows, hashes)]
+        with open(paths['responses'], 'w') as f:
+            json.dump(stored_rows if store is not None else rows, f, indent=2)
+    if 'archive' in paths:
+        write_archive(paths['archive'], rows)
+    if 'calls' in paths and instrumentation is not None:
+        instrumentation.export(paths['calls'])
+    if store is not None:
+        store.close()
+    results['outputs'] = paths
+    return results
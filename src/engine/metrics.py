@@ -0,0 +1,232 @@
+"""Live run metrics: progress bars and a Prometheus-style /metrics endpoint"""
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+# Completions inside this window drive the "recent" throughput gauge
+THROUGHPUT_WINDOW = 60.0
+# Latency samples kept per model for quantiles
+LATENCY_SAMPLES = 2000
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class RunMetrics:
+    """Thread-safe counters for a run, fed by the scheduler and caches
+
+    Cost comes from any Instrumentation objects passed in, so it reflects
+    real token usage as calls complete.
+    """
+
+    def __init__(self, instrumentation: Optional[List] = None):
+        self.instrumentation = list(instrumentation or [])
+        self.started = time.monotonic()
+        self.expected = defaultdict(int)  # (model, condition) -> jobs
+        self._expected_jobs = set()
+        self.in_flight = defaultdict(int)  # model -> requests
+        self.completed = defaultdict(int)  # (model, condition) -> jobs
+        self.failed = defaultdict(int)  # (model, condition) -> jobs
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+        self.recent = defaultdict(deque)  # model -> completion times
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.gauges: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.listeners: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def expect(self, jobs):
+        """Register planned jobs so progress totals are known (idempotent per job)"""
+        with self._lock:
+            for job in jobs:
+                if id(job) not in self._expected_jobs:
+                    self._expected_jobs.add(id(job))
+                    self.expected[(job.model, job.condition)] += 1
+
+    def request_started(self, model: str):
+        with self._lock:
+            self.in_flight[model] += 1
+
+    def request_finished(self, model: str, condition: str, latency: Optional[float], ok: bool = True):
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight[model] -= 1
+            key = (model, condition)
+            if ok:
+                self.completed[key] += 1
+            else:
+                self.failed[key] += 1
+            if latency is not None:
+                self.latencies[model].append(latency)
+            window = self.recent[model]
+            window.append(now)
+            while window and now - window[0] > THROUGHPUT_WINDOW:
+                window.popleft()
+        for listener in self.listeners:
+            listener(model, condition, ok)
+
+    def record_cache(self, hit: bool, count: int = 1):
+        with self._lock:
+            if hit:
+                self.cache_hits += count
+            else:
+                self.cache_misses += count
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Arbitrary gauge exposed on /metrics (e.g. controller decisions)"""
+        label_str = ','.join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+        with self._lock:
+            self.gauges[name][label_str] = value
+
+    @property
+    def cache_hit_rate(self) -> float:
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else 0.0
+
+    def snapshot(self) -> Dict:
+        """Current values of everything exported"""
+        now = time.monotonic()
+        with self._lock:
+            elapsed = max(now - self.started, 1e-9)
+            models = sorted({m for m, _ in self.expected} | set(self.in_flight) | set(self.latencies))
+            per_model = {}
+            for model in models:
+                done = sum(v for (m, _), v in self.completed.items() if m == model)
+                window = [t for t in self.recent[model] if now - t <= THROUGHPUT_WINDOW]
+                samples = list(self.latencies[model])
+                per_model[model] = {
+                    'in_flight': self.in_flight[model],
+                    'throughput': done / elapsed,
+                    'recent_throughput': len(window) / min(elapsed, THROUGHPUT_WINDOW),
+                    'latency': dict(zip(QUANTILES, np.quantile(samples, QUANTILES))) if samples else {},
+                }
+            snapshot = {
+                'elapsed': elapsed,
+                'expected': dict(self.expected),
+                'completed': dict(self.completed),
+                'failed': dict(self.failed),
+                'models': per_model,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'cache_hit_rate': self.cache_hit_rate,
+                'gauges': {name: dict(values) for name, values in self.gauges.items()},
+            }
+        costs = defaultdict(float)
+        for instrumentation in self.instrumentation:
+            for model, summary in instrumentation.summary().items():
+                costs[model] += summary['cost']
+        snapshot['cost'] = dict(costs)
+        return snapshot
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        s = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP curved_{name} {help_text}")
+            lines.append(f"# TYPE curved_{name} {kind}")
+            for labels, value in samples:
+                label_str = '{' + labels + '}' if labels else ''
+                lines.append(f"curved_{name}{label_str} {float(value):g}")
+
+        def ml(model, condition=None, **extra):
+            parts = [f'model="{model}"']
+            if condition is not None:
+                parts.append(f'condition="{condition}"')
+            parts.extend(f'{k}="{v}"' for k, v in extra.items())
+            return ','.join(parts)
+
+        metric("requests_in_flight", "gauge", "Requests currently in flight",
+               [(ml(m), v['in_flight']) for m, v in s['models'].items()])
+        metric("jobs_expected", "gauge", "Jobs planned for this run",
+               [(ml(m, c), v) for (m, c), v in s['expected'].items()])
+        metric("jobs_completed_total", "counter", "Jobs completed successfully",
+               [(ml(m, c), v) for (m, c), v in s['completed'].items()])
+        metric("jobs_failed_total", "counter", "Jobs that failed",
+               [(ml(m, c), v) for (m, c), v in s['failed'].items()])
+        metric("throughput_per_second", "gauge", "Completed jobs per second since start",
+               [(ml(m), v['throughput']) for m, v in s['models'].items()])
+        metric("recent_throughput_per_second", "gauge",
+               f"Finished jobs per second over the last {THROUGHPUT_WINDOW:g}s",
+               [(ml(m), v['recent_throughput']) for m, v in s['models'].items()])
+        metric("request_latency_seconds", "summary", "Request latency quantiles",
+               [(ml(m, quantile=q), v) for m, d in s['models'].items() for q, v in d['latency'].items()])
+        metric("cache_hits_total", "counter", "Response cache hits", [("", s['cache_hits'])])
+        metric("cache_misses_total", "counter", "Response cache misses", [("", s['cache_misses'])])
+        metric("cache_hit_ratio", "gauge", "Response cache hit rate", [("", s['cache_hit_rate'])])
+        metric("cost_usd_total", "counter", "Running API cost from token usage",
+               [(ml(m), v) for m, v in s['cost'].items()])
+        for name, values in s['gauges'].items():
+            metric(name, "gauge", name.replace('_', ' '), list(values.items()))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serve RunMetrics on http://host:port/metrics from a daemon thread"""
+
+    def __init__(self, metrics: RunMetrics, port: int = 9108, host: str = "127.0.0.1"):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ProgressBars:
+    """One tqdm bar per model/condition, advanced as jobs finish"""
+
+    def __init__(self, metrics: RunMetrics):
+        self.metrics = metrics
+        self.bars = {}
+        self._lock = threading.Lock()
+        for position, ((model, condition), total) in enumerate(sorted(metrics.expected.items())):
+            self.bars[(model, condition)] = tqdm(total=total, desc=f"{model}/{condition}",
+                                                 position=position, leave=True)
+        metrics.listeners.append(self.update)
+
+    def update(self, model: str, condition: str, ok: bool):
+        bar = self.bars.get((model, condition))
+        if bar is None:
+            return
+        with self._lock:
+            bar.update(1)
+            failed = self.metrics.failed.get((model, condition), 0)
+            in_flight = self.metrics.in_flight.get(model, 0)
+            bar.set_postfix(failed=failed, in_flight=in_flight, refresh=False)
+
+    def close(self):
+        self.metrics.listeners.remove(self.update)
+        for bar in self.bars.values():
+            bar.close()
@@ -0,0 +1,102 @@
+"""Approximate response-cache tier for prompts that differ only superficially
+
+Prompt sets contain near-copies: "then..." vs "then", different
+capitalisation or spacing, or a reworded sentence. For cheap exploratory
+sweeps, a prompt can reuse a cached response to such a near-copy, for the
+same model and sample. There are two tiers:
+
+    normalized  same text after lowercasing and removing punctuation and extra whitespace
+    semantic    cosine similarity of sentence embeddings >= threshold (optional, needs torch)
+
+Every reused response is flagged on its job (Job.cache_hit) and in the result
+rows, so it is never mistaken for a full-fidelity answer. Leave the tier off
+for the final run.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.engine.scheduler import Job
+
+EXACT = 'exact'
+NORMALIZED = 'normalized'
+SEMANTIC = 'semantic'
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text: str) -> str:
+    """Casefolded text without punctuation and with single spaces"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(' ' if unicodedata.category(ch).startswith('P') else ch for ch in text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class ApproximateCache:
+    """Normalized-text and optional embedding lookup over a ResponseCache's entries
+
+    Only entries that recorded their prompt text take part. Entries written
+    before prompts were recorded still serve exact lookups.
+    """
+
+    def __init__(self, cache, threshold: Optional[float] = None, encoder: Optional[str] = None,
+                 vectors: Optional[str] = None):
+        self.cache = cache
+        self.threshold = threshold
+        self.encoder_name = encoder
+        self.vectors_path = vectors
+        self._encoder = None
+        self._vectors = None
+        # (model, sample) -> normalized prompt -> (prompt, response)
+        self.entries: Dict[Tuple[str, int], Dict[str, Tuple[str, str]]] = defaultdict(dict)
+        for record in cache.records:
+            self.add(record['model'], record['sample'], record['prompt'], record['response'])
+
+    def add(self, model: str, sample: int, prompt: str, response: str):
+        self.entries[(model, sample)].setdefault(normalize_prompt(prompt), (prompt, response))
+
+    def _embed(self, texts: Sequence[str]) -> np.ndarray:
+        # Imported here: torch/transformers are only needed for the semantic tier
+        from src.core.semantic_scorer import DEFAULT_ENCODER, SentenceEncoder, VectorCache, embed_cached
+        if self._encoder is None:
+            self._encoder = SentenceEncoder(self.encoder_name or DEFAULT_ENCODER)
+            self._vectors = VectorCache(self.vectors_path) if self.vectors_path else None
+        return embed_cached(self._encoder, self._vectors, texts)
+
+    def lookup(self, jobs: List[Job]) -> int:
+        """Fill in responses for jobs with an approximate match; returns the number filled"""
+        unmatched = []
+        hits = 0
+        for job in jobs:
+            entry = self.entries.get((job.model, job.sample), {}).get(normalize_prompt(job.prompt.text))
+            if entry is None:
+                unmatched.append(job)
+                continue
+            job.response = entry[1]
+            job.cache_hit = {'tier': NORMALIZED, 'source': entry[0]}
+            hits += 1
+        if self.threshold is not None and unmatched:
+            hits += self._lookup_semantic(unmatched)
+        return hits
+
+    def _lookup_semantic(self, jobs: List[Job]) -> int:
+        by_lane = defaultdict(list)
+        for job in jobs:
+            if self.entries.get((job.model, job.sample)):
+                by_lane[(job.model, job.sample)].append(job)
+        hits = 0
+        for lane, lane_jobs in by_lane.items():
+            candidates = list(self.entries[lane].values())
+            # Encoder output is L2-normalized, so the dot product is the cosine
+            similarity = self._embed([j.prompt.text for j in lane_jobs]) @ self._embed(
+                [prompt for prompt, _ in candidates]).T
+            best = similarity.argmax(axis=1)
+            for job, index, row in zip(lane_jobs, best, similarity):
+                if row[index] >= self.threshold:
+                    source, job.response = candidates[index]
+                    job.cache_hit = {'tier': SEMANTIC, 'source': source, 'similarity': float(row[index])}
+                    hits += 1
+        return hits
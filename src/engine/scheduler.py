@@ -0,0 +1,273 @@
+"""Interleaved scheduling of generation jobs across model providers"""
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.geometric_tests import GeometricPrompt
+from src.engine.adaptive import AIMDController, is_rate_limited
+
+
+@dataclass
+class ProviderLimits:
+    """Concurrency and rate limits for one provider
+
+    With `adaptive`, max_concurrency is only the ceiling: an AIMD controller
+    starts at min_concurrency and finds the provider's working level from
+    observed latency and 429s.
+    """
+    max_concurrency: int = 4
+    requests_per_minute: Optional[float] = None
+    adaptive: bool = False
+    min_concurrency: int = 1
+
+
+# Conservative defaults for the tiers we run on
+DEFAULT_LIMITS = {
+    'openai': ProviderLimits(max_concurrency=8, requests_per_minute=500),
+    'anthropic': ProviderLimits(max_concurrency=4, requests_per_minute=50),
+    'google': ProviderLimits(max_concurrency=1, requests_per_minute=15),
+}
+
+# Short model names used across experiments -> provider whose quota they share
+MODEL_PROVIDERS = {
+    'gpt-3.5': 'openai',
+    'gpt-3.5-turbo': 'openai',
+    'gpt-4': 'openai',
+    'haiku': 'anthropic',
+    'gemini': 'google',
+    'gemini-1.5-flash': 'google',
+}
+
+
+@dataclass
+class Job:
+    """One (model, condition, prompt, sample) generation request"""
+    model: str
+    condition: str
+    prompt: GeometricPrompt
+    sample: int = 0
+    response: Optional[str] = None
+    error: Optional[str] = None
+    latency: Optional[float] = None
+    pair_id: Optional[str] = None  # shared by the members of a matched pair
+    cache_hit: Optional[Dict] = None  # set when the response came from a cache tier
+
+    @property
+    def key(self) -> str:
+        return f"{self.model}:{self.condition}:{self.prompt.prompt_id}:{self.sample}"
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls evenly to a requests-per-minute budget"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MultiModelScheduler:
+    """Run a model x condition x prompt job matrix with providers working in parallel
+
+    Each provider gets its own worker pool sized to its concurrency limit and
+    its own rate limiter, so total wall time approaches the slowest provider
+    rather than the sum of all of them. Models sharing a provider (gpt-3.5 and
+    gpt-4) are interleaved round-robin within that provider's quota. Backends
+    with a batch path get one request per batch_size jobs instead of one per job.
+    """
+
+    def __init__(self, model_funcs: Dict[str, Callable[[str], str]],
+                 limits: Optional[Dict[str, ProviderLimits]] = None,
+                 providers: Optional[Dict[str, str]] = None,
+                 metrics=None):
+        self.model_funcs = model_funcs
+        self.metrics = metrics  # optional RunMetrics fed as jobs start/finish
+        self.limits = dict(DEFAULT_LIMITS)
+        self.providers = dict(MODEL_PROVIDERS)
+        # Backends (src.models.backends) declare their provider and limits
+        for model, func in model_funcs.items():
+            if getattr(func, 'provider', None):
+                self.providers[model] = func.provider
+                self.limits[func.provider] = func.limits
+        self.limits.update(limits or {})
+        self.providers.update(providers or {})
+        self._limiters = {}
+        self._controllers: Dict[str, AIMDController] = {}
+
+    def provider_for(self, model: str) -> str:
+        """Provider whose limits apply to a model (the model itself if unknown)"""
+        return self.providers.get(model, model)
+
+    def limits_for(self, provider: str) -> ProviderLimits:
+        return self.limits.get(provider, ProviderLimits())
+
+    @staticmethod
+    def build_jobs(models: List[str], conditions: Dict[str, List[GeometricPrompt]],
+                   samples: int = 1) -> List[Job]:
+        """Expand models x conditions x prompts x samples into jobs"""
+        jobs = []
+        for model in models:
+            for condition, prompts in conditions.items():
+                for prompt in prompts:
+                    for sample in range(samples):
+                        jobs.append(Job(model, condition, prompt, sample))
+        return jobs
+
+    def interleave(self, jobs: List[Job]) -> Dict[str, List[Job]]:
+        """Group jobs by provider, round-robin across models within each provider"""
+        by_model = defaultdict(list)
+        for job in jobs:
+            by_model[job.model].append(job)
+
+        queues = defaultdict(list)
+        for provider in {self.provider_for(m) for m in by_model}:
+            lanes = [by_model[m] for m in by_model if self.provider_for(m) == provider]
+            for i in range(max(len(lane) for lane in lanes)):
+                queues[provider].extend(lane[i] for lane in lanes if i < len(lane))
+        return queues
+
+    def controller_for(self, provider: str) -> Optional[AIMDController]:
+        """The provider's AIMD controller, kept across runs so learned limits persist"""
+        limits = self.limits_for(provider)
+        if not limits.adaptive:
+            return None
+        if provider not in self._controllers:
+            self._controllers[provider] = AIMDController(
+                provider, initial=limits.min_concurrency, minimum=limits.min_concurrency,
+                maximum=max(limits.min_concurrency, limits.max_concurrency), metrics=self.metrics)
+        return self._controllers[provider]
+
+    def execution_path(self, model: str) -> str:
+        """'batch' for backends that answer many prompts per request, else 'concurrent'"""
+        func = self.model_funcs.get(model)
+        return 'batch' if 'batch' in getattr(func, 'capabilities', ()) else 'concurrent'
+
+    def _execute(self, job: Job, limiter: RateLimiter, controller: Optional[AIMDController] = None):
+        func = self.model_funcs.get(job.model)
+        if func is None:
+            job.error = f"Model {job.model} not configured"
+            return job
+        if controller:
+            controller.acquire()
+        limiter.acquire()
+        if self.metrics:
+            self.metrics.request_started(job.model)
+        throttled = False
+        start = time.perf_counter()
+        try:
+            job.response = func(job.prompt.text)
+        except Exception as e:
+            throttled = is_rate_limited(e)
+            job.error = str(e)
+        job.latency = time.perf_counter() - start
+        if controller:
+            controller.release(job.latency, job.error is None, throttled)
+        if self.metrics:
+            self.metrics.request_finished(job.model, job.condition, job.latency, job.error is None)
+        return job
+
+    def _execute_batch(self, jobs: List[Job], limiter: RateLimiter,
+                       controller: Optional[AIMDController] = None):
+        """One generate_batch call for several jobs of the same model; shares its latency"""
+        func = self.model_funcs[jobs[0].model]
+        if controller:
+            controller.acquire()
+        limiter.acquire()
+        if self.metrics:
+            for job in jobs:
+                self.metrics.request_started(job.model)
+        throttled = False
+        start = time.perf_counter()
+        try:
+            responses = func.generate_batch([job.prompt.text for job in jobs])
+            for job, response in zip(jobs, responses):
+                job.response = response
+        except Exception as e:
+            throttled = is_rate_limited(e)
+            for job in jobs:
+                job.error = str(e)
+        latency = time.perf_counter() - start
+        if controller:
+            controller.release(latency, jobs[0].error is None, throttled)
+        for job in jobs:
+            job.latency = latency
+            if self.metrics:
+                self.metrics.request_finished(job.model, job.condition, latency, job.error is None)
+        return jobs
+
+    def _submit_queue(self, executor: ThreadPoolExecutor, queue: List[Job], limiter: RateLimiter,
+                      controller: Optional[AIMDController]) -> list:
+        """Futures for a provider's queue, batching the jobs of batch-capable backends"""
+        futures = []
+        batches: Dict[str, List[Job]] = defaultdict(list)
+        for job in queue:
+            if self.execution_path(job.model) != 'batch':
+                futures.append(executor.submit(self._execute, job, limiter, controller))
+                continue
+            batch = batches[job.model]
+            batch.append(job)
+            if len(batch) >= self.model_funcs[job.model].batch_size:
+                futures.append(executor.submit(self._execute_batch, batch, limiter, controller))
+                batches[job.model] = []
+        futures.extend(executor.submit(self._execute_batch, batch, limiter, controller)
+                       for batch in batches.values() if batch)
+        return futures
+
+    def run(self, jobs: List[Job], expect: bool = True) -> List[Job]:
+        """Execute all jobs, returning them in their original order
+
+        Pass expect=False when the jobs' totals were already registered
+        with the metrics under other Job objects.
+        """
+        if self.metrics and expect:
+            self.metrics.expect(jobs)
+        executors = []
+        futures = []
+        for provider, queue in self.interleave(jobs).items():
+            limits = self.limits_for(provider)
+            limiter = self._limiters.setdefault(provider, RateLimiter(limits.requests_per_minute))
+            controller = self.controller_for(provider)
+            # The pool is sized to the ceiling; an adaptive controller gates below it
+            executor = ThreadPoolExecutor(max_workers=max(1, limits.max_concurrency),
+                                          thread_name_prefix=f"sched-{provider}")
+            executors.append(executor)
+            futures.extend(self._submit_queue(executor, queue, limiter, controller))
+
+        try:
+            wait(futures)
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+        return jobs
+
+    @staticmethod
+    def successful_responses(jobs: List[Job], model: str, conditions: List[str],
+                             paired: bool = True) -> Dict[str, Tuple[List[GeometricPrompt], List[str]]]:
+        """(prompts, responses) per condition for one model, failed calls excluded
+
+        With `paired`, position i is kept only if every condition succeeded
+        there, so matched pairs stay aligned. Error text is never returned
+        as a response.
+        """
+        lanes = {c: [job for job in jobs if job.model == model and job.condition == c] for c in conditions}
+        if not paired:
+            return {c: ([j.prompt for j in lane if j.error is None], [j.response for j in lane if j.error is None])
+                    for c, lane in lanes.items()}
+        n = min((len(lane) for lane in lanes.values()), default=0)
+        keep = [i for i in range(n) if all(lanes[c][i].error is None for c in conditions)]
+        return {c: ([lanes[c][i].prompt for i in keep], [lanes[c][i].response for i in keep])
+                for c in conditions}
@@ -0,0 +1,215 @@
+"""Durable SQLite job table with leases, shared by coordinators and workers
+
+Rows move pending -> in_flight (leased to one worker until a deadline) ->
+done or failed. A call that raises goes back to pending until it has used
+max_attempts, then becomes failed with its last error; only done rows carry
+a response, so error text never reaches the score arrays. A lease that
+expires without a result, e.g. because its worker died, makes the job
+leasable again (or failed, with error 'lease expired', once max_attempts
+leases have run out), and only the current lease holder can commit it, so each
+job's outcome is recorded exactly once and a finished job is never called
+again when a run is resumed.
+"""
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.core.geometric_tests import GeometricPrompt
+from src.engine.scheduler import Job
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    run TEXT NOT NULL,
+    model TEXT NOT NULL,
+    condition TEXT NOT NULL,
+    sample INTEGER NOT NULL,
+    prompt TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    response TEXT,
+    error TEXT,
+    latency REAL,
+    seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_run_status ON jobs (run, status);
+CREATE INDEX IF NOT EXISTS jobs_seq ON jobs (seq);
+"""
+
+
+class WorkQueue:
+    """One connection to the queue database; open one per process"""
+
+    def __init__(self, path: str, timeout: float = 30.0, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def keys_for(jobs: Iterable[Job]) -> List[str]:
+        """Queue keys: Job.key, with '#k' on the k-th repeat (cycled prompts share ids)"""
+        seen: Dict[str, int] = {}
+        keys = []
+        for job in jobs:
+            k = seen.get(job.key, 0)
+            seen[job.key] = k + 1
+            keys.append(job.key if k == 0 else f"{job.key}#{k}")
+        return keys
+
+    def submit(self, jobs: List[Job], run: str = 'default', keys: Optional[List[str]] = None) -> int:
+        """Queue jobs; keys already in the table are left as they are
+
+        Pass `keys` (from keys_for over the full job matrix) when submitting
+        a subset, so repeated prompts keep the same '#k' keys.
+        """
+        rows = [(key, run, job.model, job.condition, job.sample, json.dumps(job.prompt.__dict__))
+                for key, job in zip(keys or self.keys_for(jobs), jobs)]
+        self.conn.execute("BEGIN IMMEDIATE")
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (key, run, model, condition, sample, prompt) VALUES (?, ?, ?, ?, ?, ?)",
+            rows)
+        self.conn.execute("COMMIT")
+        return self.conn.total_changes - before
+
+    @staticmethod
+    def _job(row: sqlite3.Row, outcome: bool = True) -> Job:
+        job = Job(row['model'], row['condition'], GeometricPrompt(**json.loads(row['prompt'])), row['sample'])
+        if outcome:
+            job.response, job.error, job.latency = row['response'], row['error'], row['latency']
+        return job
+
+    def lease(self, worker: str, limit: int = 8, lease_seconds: float = 300.0,
+              models: Optional[Sequence[str]] = None,
+              run: Optional[str] = None) -> List[Tuple[str, Job]]:
+        """Claim up to `limit` pending or lease-expired jobs for `worker`, as (key, job)"""
+        now = time.time()
+        clauses, params = [], []
+        if models is not None:
+            clauses.append(f"model IN ({','.join('?' * len(models))})")
+            params.extend(models)
+        if run is not None:
+            clauses.append("run = ?")
+            params.append(run)
+        filters = ''.join(f" AND {c}" for c in clauses)
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose every attempt outlived its lease (e.g. it keeps killing the worker) fails
+            spent = self.conn.execute(
+                f"SELECT key FROM jobs WHERE status = ? AND lease_expires < ? AND attempts >= ?{filters}",
+                [IN_FLIGHT, now, self.max_attempts] + params).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = ?, response = NULL, error = ?, lease_expires = NULL,"
+                " seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs) WHERE key = ?",
+                [(FAILED, 'lease expired', row['key']) for row in spent])
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? OR (status = ? AND lease_expires < ?))"
+                f"{filters} ORDER BY rowid LIMIT ?",
+                [PENDING, IN_FLIGHT, now] + params + [limit]).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE key = ?",
+                [(IN_FLIGHT, worker, now + lease_seconds, row['key']) for row in rows])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        # A retried job starts clean; its last error stays in the table until overwritten
+        return [(row['key'], self._job(row, outcome=False)) for row in rows]
+
+    def complete(self, results: Sequence[Tuple[str, Job]], worker: str) -> List[bool]:
+        """Store outcomes of leased (key, job) pairs in one transaction
+
+        Each flag is False where the worker had lost that lease meanwhile,
+        including when the job was already committed, so repeating a commit
+        is harmless. Errors are retried until max_attempts, then failed.
+        """
+        stored = []
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, job in results:
+                if job.error is None:
+                    cursor = self.conn.execute(
+                        "UPDATE jobs SET status = ?, response = ?, error = NULL, latency = ?,"
+                        " lease_expires = NULL, seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs)"
+                        " WHERE key = ? AND worker = ? AND status = ?",
+                        (DONE, job.response, job.latency, key, worker, IN_FLIGHT))
+                else:
+                    cursor = self.conn.execute(
+                        "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,"
+                        " response = NULL, error = ?, latency = ?, lease_expires = NULL,"
+                        " seq = CASE WHEN attempts >= ? THEN (SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs) END"
+                        " WHERE key = ? AND worker = ? AND status = ?",
+                        (self.max_attempts, FAILED, PENDING, job.error, job.latency,
+                         self.max_attempts, key, worker, IN_FLIGHT))
+                stored.append(cursor.rowcount == 1)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    def counts(self, run: Optional[str] = None) -> Dict[str, int]:
+        query = "SELECT status, COUNT(*) FROM jobs" + (" WHERE run = ?" if run else "") + " GROUP BY status"
+        counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(self.conn.execute(query, (run,) if run else ()).fetchall()))
+        return counts
+
+    def outstanding(self, run: Optional[str] = None) -> int:
+        """Jobs not yet finished (pending or in flight)"""
+        counts = self.counts(run)
+        return counts[PENDING] + counts[IN_FLIGHT]
+
+    def finished_since(self, run: str, seq: int = 0) -> List[Tuple[int, str, Job]]:
+        """(seq, key, job) for jobs done or failed after `seq`, in completion order"""
+        rows = self.conn.execute(
+            "SELECT * FROM jobs WHERE run = ? AND status IN (?, ?) AND seq > ? ORDER BY seq",
+            (run, DONE, FAILED, seq)).fetchall()
+        return [(row['seq'], row['key'], self._job(row)) for row in rows]
+
+    def lookup(self, keys: Sequence[str]) -> Dict[str, Tuple[str, Job]]:
+        """key -> (status, job) for the keys present in the table"""
+        found = {}
+        for start in range(0, len(keys), 900):
+            chunk = list(keys[start:start + 900])
+            rows = self.conn.execute(
+                f"SELECT * FROM jobs WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for row in rows:
+                found[row['key']] = (row['status'], self._job(row))
+        return found
+
+    def release_in_flight(self, run: str) -> int:
+        """Return a run's leased jobs to pending, for resuming after a crash
+
+        Only safe when no other worker is serving the run.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL WHERE status = ? AND run = ?",
+            (PENDING, IN_FLIGHT, run))
+        self.conn.execute("COMMIT")
+        return cursor.rowcount
+
+    def retry_failed(self, run: Optional[str] = None) -> int:
+        """Return failed jobs to pending with a fresh attempt budget"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = ?, attempts = 0, seq = NULL WHERE status = ?"
+            + (" AND run = ?" if run else ""),
+            (PENDING, FAILED) + ((run,) if run else ()))
+        self.conn.execute("COMMIT")
+        return cursor.rowcount
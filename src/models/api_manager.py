@@ -2,6 +2,7 @@
 import os
 from openai import OpenAI
 from typing import Optional
+from src.models.instrumentation import Instrumentation
 
 class ModelManager:
     """Manage API calls to real models"""
@@ -14,19 +15,22 @@ class ModelManager:
         
         self.client = OpenAI(api_key=api_key)
         self.total_cost = 0.0
+        self.instrumentation = Instrumentation()
     
     def generate(self, prompt: str, model: str = "gpt-3.5-turbo") -> str:
         """Generate response from OpenAI model"""
         try:
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=150,
-                temperature=0.7
-            )
+            with self.instrumentation.track(model) as call:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=150,
+                    temperature=0.7
+                )
+                call.set_usage(response)
             
-            # Track approximate cost (GPT-3.5: ~$0.002 per 1K tokens)
-            self.total_cost += 0.002
+            # Cost from reported token usage and the pricing table
+            self.total_cost += call.record.cost
             
             return response.choices[0].message.content
             
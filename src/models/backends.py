@@ -0,0 +1,391 @@
+"""Provider-agnostic model backends with declared capabilities, limits and pricing
+
+A backend wraps one model under its short name (gpt-3.5, haiku, ...). It
+declares what it can do:
+
+    sync    generate(prompt) -> str
+    async   await agenerate(prompt) -> str
+    batch   generate_batch(prompts) -> [str] in one request/forward pass
+    stream  stream(prompt) yields text chunks
+
+It also declares the ProviderLimits it should run under and its price per 1K
+tokens. SDK clients are built with their own retries off. Backends retry
+transient errors themselves, so every retry is counted on the call record. Backends are callable like the old model functions, so they drop
+into MultiModelScheduler, QueueWorker and the experiment runner unchanged.
+The scheduler sends batch-capable backends one batch per call and every
+other backend concurrent single calls
+(MultiModelScheduler.execution_path).
+
+Third-party packages add backends through the `curved_cognition.backends`
+entry-point group. Each entry point names a factory that takes
+(instrumentation=..., **options) and returns a Backend:
+
+    [project.entry-points."curved_cognition.backends"]
+    llama-8b = "my_pkg.backends:make_llama"
+"""
+import asyncio
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from functools import partial
+from importlib.metadata import entry_points
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from src.engine.scheduler import DEFAULT_LIMITS, ProviderLimits
+from src.models.instrumentation import Instrumentation
+from src.models.token_counts import count_tokens, register_tokenizer
+
+ENTRY_POINT_GROUP = "curved_cognition.backends"
+
+SYNC = 'sync'
+ASYNC = 'async'
+BATCH = 'batch'
+STREAM = 'stream'
+
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient errors worth another attempt: timeouts, connection drops, 408/409/429/5xx"""
+    for attr in ('status_code', 'code'):
+        status = getattr(error, attr, None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUS or status >= 500
+    name = type(error).__name__
+    return 'Timeout' in name or 'Connection' in name
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, as the provider SDKs use by default"""
+    return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.75, 1.0)
+
+
+class Backend(ABC):
+    """One model behind a uniform generate/agenerate/generate_batch/stream interface"""
+
+    provider: str = 'local'
+    capabilities: FrozenSet[str] = frozenset({SYNC})
+    env_key: Optional[str] = None  # environment variable the backend needs, if any
+    batch_size: int = 16
+
+    def __init__(self, name: str, api_model: str, instrumentation: Optional[Instrumentation] = None,
+                 limits: Optional[ProviderLimits] = None,
+                 pricing: Optional[Tuple[float, float]] = None,
+                 max_tokens: int = 150, temperature: float = 0.7, max_retries: int = 2):
+        self.name = name
+        self.api_model = api_model
+        self.instrumentation = instrumentation or Instrumentation()
+        self.limits = limits or DEFAULT_LIMITS.get(self.provider, ProviderLimits())
+        self.pricing = pricing or self.instrumentation.pricing.get(api_model, (0.0, 0.0))
+        self.instrumentation.pricing[api_model] = self.pricing
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.max_retries = max_retries
+
+    @classmethod
+    def available(cls) -> bool:
+        """Whether credentials for this backend are configured"""
+        return cls.env_key is None or bool(os.getenv(cls.env_key))
+
+    def supports(self, capability: str) -> bool:
+        return capability in self.capabilities
+
+    @abstractmethod
+    def generate(self, prompt: str) -> str:
+        pass
+
+    def __call__(self, prompt: str) -> str:
+        return self.generate(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        """Native coroutine where the SDK has one, otherwise generate() on a thread"""
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        raise NotImplementedError(f"{self.name} has no batch path")
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield text as it arrives; the default yields the whole response once"""
+        yield self.generate(prompt)
+
+    def track(self):
+        return self.instrumentation.track(self.name, self.api_model)
+
+    def _retry(self, call, request: Callable[..., Any], *args, **kwargs) -> Any:
+        """request(*args, **kwargs), retrying transient errors and counting retries on `call`"""
+        attempt = 0
+        while True:
+            try:
+                return request(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(retry_delay(attempt))
+                attempt += 1
+                call.retries += 1
+
+    async def _aretry(self, call, request: Callable[..., Any], *args, **kwargs) -> Any:
+        """Async counterpart of _retry"""
+        attempt = 0
+        while True:
+            try:
+                return await request(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(retry_delay(attempt))
+                attempt += 1
+                call.retries += 1
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r}, {self.api_model!r})"
+
+
+def _close(stream):
+    """Close a provider stream so an early stop cancels the request"""
+    close = getattr(stream, 'close', None) or getattr(getattr(stream, 'response', None), 'close', None)
+    if close:
+        close()
+
+
+class OpenAIChatBackend(Backend):
+    """OpenAI chat completions; one client per backend, reused across calls"""
+
+    provider = 'openai'
+    capabilities = frozenset({SYNC, ASYNC, STREAM})
+    env_key = 'OPENAI_API_KEY'
+
+    def __init__(self, name: str, api_model: str, **kwargs):
+        super().__init__(name, api_model, **kwargs)
+        from openai import AsyncOpenAI, OpenAI
+        self.client = OpenAI(max_retries=0)
+        self._async_client = None
+        self._async_factory = partial(AsyncOpenAI, max_retries=0)
+
+    def _request(self, prompt: str) -> Dict:
+        return dict(model=self.api_model, messages=[{"role": "user", "content": prompt}],
+                    max_tokens=self.max_tokens, temperature=self.temperature)
+
+    def generate(self, prompt: str) -> str:
+        with self.track() as call:
+            response = self._retry(call, self.client.chat.completions.create, **self._request(prompt))
+            call.set_usage(response)
+        return response.choices[0].message.content
+
+    async def agenerate(self, prompt: str) -> str:
+        if self._async_client is None:
+            self._async_client = self._async_factory()
+        with self.track() as call:
+            response = await self._aretry(call, self._async_client.chat.completions.create,
+                                          **self._request(prompt))
+            call.set_usage(response)
+        return response.choices[0].message.content
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        with self.track() as call:
+            stream = self._retry(call, self.client.chat.completions.create, **self._request(prompt),
+                                 stream=True, stream_options={"include_usage": True})
+            try:
+                for chunk in stream:
+                    if chunk.usage is not None:
+                        # Final chunk: the real usage, with no choices
+                        call.set_usage(chunk)
+                        continue
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if text:
+                        call.first_token()
+                        # Running estimate (~one token per delta) in case the stream is cut short
+                        call.completion_tokens += 1
+                        yield text
+            finally:
+                _close(stream)
+                if not call.prompt_tokens:
+                    # Stopped before the usage chunk: count the prompt locally
+                    call.prompt_tokens = int(count_tokens(self.name, [prompt])[0])
+
+
+class AnthropicBackend(Backend):
+    """Anthropic messages API"""
+
+    provider = 'anthropic'
+    capabilities = frozenset({SYNC, ASYNC, STREAM})
+    env_key = 'ANTHROPIC_API_KEY'
+
+    def __init__(self, name: str, api_model: str, **kwargs):
+        super().__init__(name, api_model, **kwargs)
+        import anthropic
+        self.client = anthropic.Anthropic(api_key=os.getenv(self.env_key), max_retries=0)
+        self._async_client = None
+        self._async_factory = partial(anthropic.AsyncAnthropic, api_key=os.getenv(self.env_key),
+                                      max_retries=0)
+
+    def _request(self, prompt: str) -> Dict:
+        return dict(model=self.api_model, messages=[{"role": "user", "content": prompt}],
+                    max_tokens=self.max_tokens, temperature=self.temperature)
+
+    def generate(self, prompt: str) -> str:
+        with self.track() as call:
+            response = self._retry(call, self.client.messages.create, **self._request(prompt))
+            call.set_usage(response)
+        return response.content[0].text
+
+    async def agenerate(self, prompt: str) -> str:
+        if self._async_client is None:
+            self._async_client = self._async_factory()
+        with self.track() as call:
+            response = await self._aretry(call, self._async_client.messages.create, **self._request(prompt))
+            call.set_usage(response)
+        return response.content[0].text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        with self.track() as call:
+            stream = self._retry(call, self.client.messages.create, **self._request(prompt), stream=True)
+            try:
+                for event in stream:
+                    if event.type == 'message_start':
+                        call.prompt_tokens = event.message.usage.input_tokens
+                    elif event.type == 'content_block_delta':
+                        call.first_token()
+                        call.completion_tokens += 1
+                        yield event.delta.text
+                    elif event.type == 'message_delta':
+                        call.completion_tokens = event.usage.output_tokens
+            finally:
+                _close(stream)
+
+
+class GeminiBackend(Backend):
+    """Google Gemini via google.generativeai"""
+
+    provider = 'google'
+    capabilities = frozenset({SYNC, ASYNC, STREAM})
+    env_key = 'GOOGLE_API_KEY'
+
+    def __init__(self, name: str, api_model: str, **kwargs):
+        super().__init__(name, api_model, **kwargs)
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv(self.env_key))
+        self.model = genai.GenerativeModel(api_model)
+
+    def generate(self, prompt: str) -> str:
+        with self.track() as call:
+            response = self._retry(call, self.model.generate_content, prompt)
+            call.set_usage(response)
+        return response.text
+
+    async def agenerate(self, prompt: str) -> str:
+        with self.track() as call:
+            response = await self._aretry(call, self.model.generate_content_async, prompt)
+            call.set_usage(response)
+        return response.text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        with self.track() as call:
+            for chunk in self._retry(call, self.model.generate_content, prompt, stream=True):
+                call.first_token()
+                call.set_usage(chunk)
+                yield chunk.text
+
+
+class TransformersBackend(Backend):
+    """Local Hugging Face causal LM with padded batched generation
+
+    Free to run, so it is priced at zero. The scheduler sends it one batch
+    per call instead of concurrent single prompts.
+    """
+
+    capabilities = frozenset({SYNC, ASYNC, BATCH})
+    batch_size = 16
+
+    def __init__(self, name: str, api_model: str, device: Optional[str] = None, **kwargs):
+        kwargs.setdefault('limits', ProviderLimits(max_concurrency=1))
+        super().__init__(name, api_model, **kwargs)
+        register_tokenizer(name, 'hf', api_model)
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        self.torch = torch
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.tokenizer = AutoTokenizer.from_pretrained(api_model, padding_side='left')
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(api_model).to(self.device).eval()
+
+    def generate(self, prompt: str) -> str:
+        return self.generate_batch([prompt])[0]
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        with self.track() as call:
+            inputs = self.tokenizer(list(prompts), return_tensors='pt', padding=True).to(self.device)
+            with self.torch.inference_mode():
+                output = self.model.generate(**inputs, max_new_tokens=self.max_tokens, do_sample=True,
+                                             temperature=self.temperature,
+                                             pad_token_id=self.tokenizer.pad_token_id)
+            completions = output[:, inputs['input_ids'].shape[1]:]
+            call.prompt_tokens = int(inputs['attention_mask'].sum())
+            call.completion_tokens = int((completions != self.tokenizer.pad_token_id).sum())
+        return self.tokenizer.batch_decode(completions, skip_special_tokens=True)
+
+
+# Short model names -> API model ids (used for pricing)
+MODEL_IDS = {
+    'gpt-3.5': 'gpt-3.5-turbo',
+    'haiku': 'claude-3-5-haiku-20241022',
+    'gemini': 'gemini-1.5-flash',
+    'gpt-4': 'gpt-4-turbo-preview',
+}
+
+# Built-in backends by short model name
+BUILTIN_BACKENDS: Dict[str, Callable[..., Backend]] = {
+    'gpt-3.5': partial(OpenAIChatBackend, 'gpt-3.5', MODEL_IDS['gpt-3.5']),
+    'gpt-4': partial(OpenAIChatBackend, 'gpt-4', MODEL_IDS['gpt-4']),
+    'haiku': partial(AnthropicBackend, 'haiku', MODEL_IDS['haiku']),
+    'gemini': partial(GeminiBackend, 'gemini', MODEL_IDS['gemini']),
+}
+
+_registry: Dict[str, Callable[..., Backend]] = dict(BUILTIN_BACKENDS)
+_entry_points_loaded = False
+
+
+def register_backend(name: str, factory: Callable[..., Backend]):
+    """Make a backend factory available under a short model name"""
+    _registry[name] = factory
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        # Installed plugins don't override names registered in code
+        _registry.setdefault(entry_point.name, entry_point.load())
+
+
+def available_backends() -> List[str]:
+    _load_entry_points()
+    return sorted(_registry)
+
+
+def _factory_class(factory):
+    return factory.func if isinstance(factory, partial) else factory
+
+
+def load_backend(name: str, instrumentation: Optional[Instrumentation] = None, **options) -> Backend:
+    _load_entry_points()
+    if name not in _registry:
+        raise KeyError(f"Unknown backend {name!r}, expected one of {available_backends()}")
+    return _registry[name](instrumentation=instrumentation, **options)
+
+
+def load_backends(names: Optional[Iterable[str]] = None,
+                  instrumentation: Optional[Instrumentation] = None) -> Dict[str, Backend]:
+    """Backends for `names` (default: all registered) whose credentials are configured"""
+    _load_entry_points()
+    backends = {}
+    for name in (available_backends() if names is None else names):
+        cls = _factory_class(_registry.get(name))
+        if isinstance(cls, type) and issubclass(cls, Backend) and not cls.available():
+            continue
+        backends[name] = load_backend(name, instrumentation)
+    return backends
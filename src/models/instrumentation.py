@@ -0,0 +1,167 @@
+"""Per-call latency, token and cost instrumentation for model APIs"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# USD per 1K tokens as (prompt, completion), keyed by API model id
+PRICING = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-4-turbo-preview': (0.01, 0.03),
+    'claude-3-5-haiku-20241022': (0.0008, 0.004),
+    'gemini-1.5-flash': (0.000075, 0.0003),
+}
+
+QUANTILES = (50, 95, 99)
+
+
+def usage_from_response(response) -> Tuple[int, int]:
+    """Extract (prompt_tokens, completion_tokens) from any provider's response"""
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        # OpenAI uses prompt/completion, Anthropic uses input/output
+        prompt = getattr(usage, 'prompt_tokens', None)
+        if prompt is None:
+            prompt = getattr(usage, 'input_tokens', 0)
+        completion = getattr(usage, 'completion_tokens', None)
+        if completion is None:
+            completion = getattr(usage, 'output_tokens', 0)
+        return prompt or 0, completion or 0
+
+    # Gemini
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata is not None:
+        return (getattr(metadata, 'prompt_token_count', 0) or 0,
+                getattr(metadata, 'candidates_token_count', 0) or 0)
+    return 0, 0
+
+
+@dataclass
+class CallRecord:
+    """Measurements for a single API request"""
+    model: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    ttft: Optional[float] = None  # only known for streamed calls
+    retries: int = 0
+    error: Optional[str] = None
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+class CallTimer:
+    """Mutable handle filled in while a tracked call is running"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttft = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.record = None  # CallRecord, set when the call finishes
+
+    def first_token(self):
+        """Mark arrival of the first streamed token"""
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.start
+
+    def set_usage(self, response):
+        self.prompt_tokens, self.completion_tokens = usage_from_response(response)
+
+
+class Instrumentation:
+    """Thread-safe recorder of API calls with per-model aggregation"""
+
+    def __init__(self, pricing: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.pricing = dict(PRICING)
+        self.pricing.update(pricing or {})
+        self.calls: List[CallRecord] = []
+        self._lock = threading.Lock()
+
+    def cost_for(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Cost in USD for a call; unknown models are priced at zero"""
+        prompt_rate, completion_rate = self.pricing.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_rate + completion_tokens * completion_rate) / 1000
+
+    def record(self, model: str, latency: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, ttft: Optional[float] = None,
+               retries: int = 0, error: Optional[str] = None,
+               api_model: Optional[str] = None) -> CallRecord:
+        """Record one call; `api_model` selects the pricing row if it differs from `model`"""
+        cost = self.cost_for(api_model or model, prompt_tokens, completion_tokens)
+        call = CallRecord(model, latency, prompt_tokens, completion_tokens,
+                          cost, ttft, retries, error)
+        with self._lock:
+            self.calls.append(call)
+        return call
+
+    @contextmanager
+    def track(self, model: str, api_model: Optional[str] = None):
+        """Time a call; errors are recorded and re-raised"""
+        timer = CallTimer()
+        error = None
+        try:
+            yield timer
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            timer.record = self.record(
+                model, time.perf_counter() - timer.start,
+                timer.prompt_tokens, timer.completion_tokens,
+                timer.ttft, timer.retries, error, api_model
+            )
+
+    def total_cost(self, model: Optional[str] = None) -> float:
+        with self._lock:
+            return sum(c.cost for c in self.calls if model is None or c.model == model)
+
+    def mean_cost(self, model: str) -> Optional[float]:
+        """Average cost of a model's calls that reported token usage, if any did"""
+        with self._lock:
+            costs = [c.cost for c in self.calls
+                     if c.model == model and c.prompt_tokens + c.completion_tokens > 0]
+        return sum(costs) / len(costs) if costs else None
+
+    @staticmethod
+    def _quantiles(values: List[float]) -> Dict[str, Optional[float]]:
+        if not values:
+            return {f'p{q}': None for q in QUANTILES}
+        return {f'p{q}': float(v) for q, v in zip(QUANTILES, np.percentile(values, QUANTILES))}
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-model latency/TTFT quantiles, token totals, retries and cost"""
+        with self._lock:
+            calls = list(self.calls)
+
+        by_model = {}
+        for call in calls:
+            by_model.setdefault(call.model, []).append(call)
+
+        summary = {}
+        for model, model_calls in by_model.items():
+            ok = [c for c in model_calls if c.error is None]
+            summary[model] = {
+                'n_calls': len(model_calls),
+                'n_errors': len(model_calls) - len(ok),
+                'latency': self._quantiles([c.latency for c in ok]),
+                'ttft': self._quantiles([c.ttft for c in ok if c.ttft is not None]),
+                'prompt_tokens': sum(c.prompt_tokens for c in model_calls),
+                'completion_tokens': sum(c.completion_tokens for c in model_calls),
+                'retries': sum(c.retries for c in model_calls),
+                'cost': sum(c.cost for c in model_calls),
+            }
+        return summary
+
+    def export(self, filename: str):
+        """Write summary and raw call records as JSON"""
+        with self._lock:
+            calls = [asdict(c) for c in self.calls]
+        with open(filename, "w") as f:
+            json.dump({'summary': self.summary(), 'calls': calls}, f, indent=2)
@@ -1,61 +1,44 @@
 """Manager for multiple AI models"""
-import os
-import openai
-import anthropic
-import google.generativeai as genai
-from typing import Optional
+from typing import Dict, Iterable, Iterator, Optional
+from src.models.backends import MODEL_IDS, Backend, load_backends
+from src.models.instrumentation import Instrumentation
+
+# Models loaded when none are named; gpt-4 costs ~15x gpt-3.5, so ask for it explicitly
+DEFAULT_MODELS = ('gpt-3.5', 'haiku', 'gemini')
 
 class MultiModelManager:
-    """Test multiple models on same prompts"""
+    """Test multiple models on same prompts
     
-    def __init__(self):
-        self.costs = {}
-        self.models = {}
-        
-        # OpenAI
-        if os.getenv('OPENAI_API_KEY'):
-            openai.api_key = os.getenv('OPENAI_API_KEY')
-            self.models['gpt-3.5'] = self.generate_openai
-            
-        # Anthropic
-        if os.getenv('ANTHROPIC_API_KEY'):
-            self.anthropic_client = anthropic.Anthropic(
-                api_key=os.getenv('ANTHROPIC_API_KEY')
-            )
-            self.models['haiku'] = self.generate_anthropic
-            
-        # Google
-        if os.getenv('GOOGLE_API_KEY'):
-            genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-            self.gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-            self.models['gemini'] = self.generate_gemini
+    Each model is a Backend (src.models.backends) sharing this manager's
+    instrumentation; models without configured API keys are left out.
+    """
     
-    def generate_openai(self, prompt: str) -> str:
-        from openai import OpenAI
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150,
-            temperature=0.7
-        )
-        self.costs['gpt-3.5'] = self.costs.get('gpt-3.5', 0) + 0.002
-        return response.choices[0].message.content
+    def __init__(self, models: Optional[Iterable[str]] = None):
+        self.instrumentation = Instrumentation()
+        self.backends: Dict[str, Backend] = load_backends(
+            DEFAULT_MODELS if models is None else models, self.instrumentation)
+        # Backends are callable, so these work anywhere a model function does
+        self.models = dict(self.backends)
+        self.streams = {name: b.stream for name, b in self.backends.items()}
     
-    def generate_anthropic(self, prompt: str) -> str:
-        response = self.anthropic_client.messages.create(
-            model="claude-3-5-haiku-20241022",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150,
-            temperature=0.7
-        )
-        self.costs['haiku'] = self.costs.get('haiku', 0) + 0.001
-        return response.content[0].text
+    @property
+    def costs(self) -> Dict[str, float]:
+        """Cost so far per model, from recorded token usage"""
+        return {m: s['cost'] for m, s in self.instrumentation.summary().items()}
     
-    def generate_gemini(self, prompt: str) -> str:
-        response = self.gemini_model.generate_content(prompt)
-        self.costs['gemini'] = self.costs.get('gemini', 0) + 0.001
-        return response.text
+    def stream(self, model_name: str, prompt: str) -> Iterator[str]:
+        """Yield response text as it arrives; close the iterator to cancel"""
+        if model_name not in self.streams:
+            yield f"Model {model_name} not configured"
+            return
+        chunks = self.streams[model_name](prompt)
+        try:
+            yield from chunks
+        except Exception as e:
+            print(f"Error with {model_name}: {e}")
+            yield f"Error: {str(e)}"
+        finally:
+            chunks.close()
     
     def generate(self, model_name: str, prompt: str) -> str:
         if model_name in self.models:
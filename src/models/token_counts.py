@@ -0,0 +1,201 @@
+"""Per-model prompt token lengths from each model's own tokenizer
+
+Word counts are a poor proxy for what a model sees. "Thinking about
+thinking about thinking" and a list of day names have the same word count
+but different BPE token counts. TokenizerPool maps each short model name to
+a tokenizer spec:
+
+    ('tiktoken', 'cl100k_base')       OpenAI BPE via tiktoken
+    ('hf', 'meta-llama/Llama-3.1-8B') Hugging Face `tokenizers` from the hub
+    ('approx', '')                    words * TOKENS_PER_WORD (no public tokenizer)
+
+Each tokenizer is loaded once per process and shared by every model that
+uses it. Texts are encoded in batches. tiktoken and tokenizers are optional.
+If one is missing or a tokenizer can't be loaded, that spec falls back to
+the word estimate with a single warning, and its counts are labelled
+'approx' so they never pass for exact ones.
+
+TokenLengthIndex memoizes counts per tokenizer and text. When saved next to
+a prompts file (<prompts>.tokens.json), later plans and budgets reuse it
+instead of encoding again:
+
+    python -m src.models.token_counts data/prompts/matched_20_pairs.json --models gpt-3.5 haiku
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import warnings
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rough tokens per whitespace word, for models without a local tokenizer
+TOKENS_PER_WORD = 1.3
+
+APPROX = ('approx', '')
+
+# Short model names -> tokenizer spec
+TOKENIZERS: Dict[str, Tuple[str, str]] = {
+    'gpt-3.5': ('tiktoken', 'cl100k_base'),
+    'gpt-4': ('tiktoken', 'cl100k_base'),
+    # Anthropic and Google publish no local tokenizer for these models
+    'haiku': APPROX,
+    'gemini': APPROX,
+}
+
+
+def register_tokenizer(model: str, kind: str, name: str = ''):
+    """Count `model`'s tokens with a tiktoken encoding or Hugging Face tokenizer"""
+    TOKENIZERS[model] = (kind, name)
+
+
+def approximate_counts(texts: Sequence[str]) -> List[int]:
+    return [math.ceil(len(t.split()) * TOKENS_PER_WORD) for t in texts]
+
+
+def _load_tiktoken(name: str) -> Callable[[Sequence[str]], List[int]]:
+    import tiktoken
+    encoding = tiktoken.get_encoding(name)
+    return lambda texts: [len(ids) for ids in encoding.encode_ordinary_batch(list(texts))]
+
+
+def _load_hf(name: str) -> Callable[[Sequence[str]], List[int]]:
+    from tokenizers import Tokenizer
+    tokenizer = Tokenizer.from_pretrained(name)
+    return lambda texts: [len(e.ids) for e in tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+
+LOADERS = {'tiktoken': _load_tiktoken, 'hf': _load_hf}
+
+
+class TokenizerPool:
+    """Tokenizers loaded once and shared, keyed by spec"""
+
+    def __init__(self, tokenizers: Optional[Dict[str, Tuple[str, str]]] = None):
+        self.tokenizers = TOKENIZERS if tokenizers is None else tokenizers
+        self._counters: Dict[Tuple[str, str], Tuple[str, Callable]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, model: str) -> Tuple[str, Callable[[Sequence[str]], List[int]]]:
+        """(tokenizer id, batch counter) for a model; the id is 'approx' after a fallback"""
+        spec = self.tokenizers.get(model, APPROX)
+        with self._lock:
+            if spec not in self._counters:
+                self._counters[spec] = self._load(spec)
+            return self._counters[spec]
+
+    @staticmethod
+    def _load(spec: Tuple[str, str]) -> Tuple[str, Callable]:
+        kind, name = spec
+        if kind in LOADERS:
+            try:
+                return f"{kind}:{name}", LOADERS[kind](name)
+            except Exception as e:  # missing package, unknown name, no network for the hub
+                warnings.warn(f"Tokenizer {kind}:{name} unavailable ({e}); "
+                              f"estimating {TOKENS_PER_WORD} tokens per word")
+        return 'approx', approximate_counts
+
+    def exact(self, model: str) -> bool:
+        return self.resolve(model)[0] != 'approx'
+
+    def count(self, model: str, texts: Sequence[str]) -> np.ndarray:
+        """Token lengths of texts under the model's tokenizer, encoded as one batch"""
+        return np.asarray(self.resolve(model)[1](texts), dtype=np.int64)
+
+
+_default_pool = TokenizerPool()
+
+
+def count_tokens(model: str, texts: Sequence[str]) -> np.ndarray:
+    """Token lengths under the model's tokenizer, from the shared default pool"""
+    return _default_pool.count(model, texts)
+
+
+def _text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class TokenLengthIndex:
+    """Token lengths memoized per tokenizer and text, optionally persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None, pool: Optional[TokenizerPool] = None):
+        self.path = path
+        self.pool = pool or _default_pool
+        self.lengths_by_tokenizer: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.lengths_by_tokenizer = json.load(f)['tokenizers']
+
+    @staticmethod
+    def path_for(prompts_path: str) -> str:
+        return f"{prompts_path}.tokens.json"
+
+    @classmethod
+    def for_prompts(cls, prompts_path: Optional[str], pool: Optional[TokenizerPool] = None) -> 'TokenLengthIndex':
+        """The saved index next to a prompts file, if any (in-memory otherwise)"""
+        return cls(cls.path_for(prompts_path) if prompts_path else None, pool)
+
+    def lengths(self, model: str, texts: Sequence[str]) -> np.ndarray:
+        """Token lengths for texts; only texts not yet indexed are encoded, in one batch"""
+        tokenizer, counter = self.pool.resolve(model)
+        keys = [_text_key(t) for t in texts]
+        with self._lock:
+            known = self.lengths_by_tokenizer.setdefault(tokenizer, {})
+            missing = {k: t for k, t in zip(keys, texts) if k not in known}
+        if missing:
+            counted = dict(zip(missing, counter(list(missing.values()))))
+            with self._lock:
+                known.update(counted)
+        return np.array([known[k] for k in keys], dtype=np.int64)
+
+    def length(self, model: str, text: str) -> int:
+        return int(self.lengths(model, [text])[0])
+
+    def add(self, models: Iterable[str], texts: Sequence[str]):
+        for model in models:
+            self.lengths(model, texts)
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._lock:
+            # Fallback estimates are not worth persisting
+            exact = {k: v for k, v in self.lengths_by_tokenizer.items() if k != 'approx'}
+        with open(path, 'w') as f:
+            json.dump({'tokenizers': exact}, f)
+
+
+def prompt_texts(prompts_path: str) -> List[str]:
+    """Every prompt text in a {condition: [prompt, ...]} file"""
+    with open(prompts_path) as f:
+        data = json.load(f)
+    return [p['text'] for prompts in data.values() if isinstance(prompts, list) for p in prompts]
+
+
+def build_index(prompts_path: str, models: Iterable[str], pool: Optional[TokenizerPool] = None) -> TokenLengthIndex:
+    """Count a prompt file's texts for each model and save the index beside it"""
+    index = TokenLengthIndex.for_prompts(prompts_path, pool)
+    index.add(models, prompt_texts(prompts_path))
+    index.save()
+    return index
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.models.token_counts",
+                                     description="Build the token-length index for prompt files")
+    parser.add_argument("prompts", nargs="+")
+    parser.add_argument("--models", nargs="+", default=list(TOKENIZERS))
+    args = parser.parse_args(argv)
+    for prompts_path in args.prompts:
+        index = build_index(prompts_path, args.models)
+        print(f"{index.path}: " + ", ".join(
+            f"{m} ({index.pool.resolve(m)[0]})" for m in args.models))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,6 +5,13 @@ from src.core.geometric_tests import GeometricTest, GeometricPrompt
 class LinearTemporalTest(GeometricTest):
     """Control: Standard linear time reasoning"""
     
+    # Maximum value of each score component (clarity shrinks with length)
+    COMPONENT_CAPS = {
+        'sequence': 0.5,
+        'logic': 0.3
+    }
+    LENGTH_DEPENDENT = ('clarity',)
+    
     def generate_prompts(self, n: int) -> List[GeometricPrompt]:
         """Generate linear temporal prompts for control"""
         prompts = [
@@ -0,0 +1,85 @@
+"""Recursive temporal prompts generated at arbitrary nesting depth"""
+from itertools import product
+from typing import Dict, List
+from src.core.geometric_tests import GeometricPrompt
+from src.tests.spiral_temporal import SpiralTemporalTest
+
+# Building blocks; each (opener, unit, verb offset) combination is one template
+OPENERS = [
+    "I remember last {unit}",
+    "Last {unit} I kept thinking about the {unit} before",
+    "This {unit} reminds me of last {unit}",
+    "Looking back on last {unit}",
+    "I keep returning to last {unit}",
+]
+UNITS = ["week", "year", "autumn", "summer", "birthday", "winter", "morning", "holiday", "spring", "semester"]
+NESTING_VERBS = [
+    "remembering", "thinking about", "recalling", "dreaming about",
+    "reflecting on", "realizing something about", "wondering about",
+]
+
+
+class RecursiveDepthTest(SpiralTemporalTest):
+    """Spiral scoring applied to prompts of controlled recursion depth"""
+    
+    def __init__(self, model_name: str = None, max_depth: int = 4):
+        super().__init__(model_name)
+        self.max_depth = max_depth
+    
+    @staticmethod
+    def max_templates(depth: int) -> int:
+        """Distinct prompts build_prompt yields at a depth; depth 1 has no verb to vary"""
+        combos = len(OPENERS) * len(UNITS)
+        return combos if depth == 1 else combos * len(NESTING_VERBS)
+    
+    @staticmethod
+    def build_prompt(depth: int, template: int) -> GeometricPrompt:
+        """Prompt with `depth` nested levels of temporal recursion"""
+        combos = list(product(range(len(OPENERS)), range(len(UNITS))))
+        opener, unit = combos[template % len(combos)]
+        offset = template // len(combos)
+        unit_name = UNITS[unit]
+        
+        parts = [OPENERS[opener].format(unit=unit_name)]
+        for level in range(1, depth):
+            verb = NESTING_VERBS[(offset + level - 1) % len(NESTING_VERBS)]
+            before = "the " + unit_name + " before" + (" that" if level > 1 else "")
+            parts.append(f"{verb} {before}")
+        
+        return GeometricPrompt(
+            text=", ".join(parts) + " when...",
+            category="recursive",
+            complexity=min(5, depth),
+            expected_pattern=f"recursion_depth_{depth}",
+            prompt_id=f"depth{depth}_t{template}"
+        )
+    
+    def generate_depth_prompts(self, max_depth: int, n_templates: int) -> Dict[int, List[GeometricPrompt]]:
+        """Up to n_templates distinct prompts at every depth from 1 to max_depth
+        
+        Depths are capped at max_templates(depth) rather than repeating a
+        prompt, so depth 1 gets at most 50 prompts.
+        """
+        prompts = {
+            depth: [self.build_prompt(depth, t) for t in range(min(n_templates, self.max_templates(depth)))]
+            for depth in range(1, max_depth + 1)
+        }
+        for depth, depth_prompts in prompts.items():
+            texts = [p.text for p in depth_prompts]
+            if len(set(texts)) != len(texts):
+                raise ValueError(f"Duplicate prompt texts at depth {depth}")
+        return prompts
+    
+    def generate_prompts(self, n: int) -> List[GeometricPrompt]:
+        """n distinct prompts cycling through depths 1..max_depth (skipping exhausted depths)"""
+        available = sum(self.max_templates(d) for d in range(1, self.max_depth + 1))
+        if n > available:
+            raise ValueError(f"Only {available} distinct prompts up to depth {self.max_depth}, asked for {n}")
+        prompts = []
+        template = 0
+        while len(prompts) < n:
+            for depth in range(1, self.max_depth + 1):
+                if len(prompts) < n and template < self.max_templates(depth):
+                    prompts.append(self.build_prompt(depth, template))
+            template += 1
+        return prompts
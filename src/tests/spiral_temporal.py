@@ -6,6 +6,14 @@ from src.core.geometric_tests import GeometricTest, GeometricPrompt
 class SpiralTemporalTest(GeometricTest):
     """Test understanding of spiral time patterns"""
     
+    # Maximum value of each score component
+    COMPONENT_CAPS = {
+        'recursion': 0.3,
+        'progression': 0.3,
+        'same_different': 0.2,
+        'temporal_depth': 0.2
+    }
+    
     def generate_prompts(self, n: int) -> List[GeometricPrompt]:
         """Generate spiral temporal reasoning prompts"""
         prompts = []